@@ -159,7 +159,8 @@ class ExcelConverter:
         print("Batch processing completed.")
 
 # Example Usage:
-converter = ExcelConverter()
-converter.process_single_file("Data/eksisting Jalan Siliwangi.xlsx")
-# converter.process_folder("Data/Excel_Files")
+if __name__ == "__main__":
+    converter = ExcelConverter()
+    converter.process_single_file("Data/eksisting Jalan Siliwangi.xlsx")
+    # converter.process_folder("Data/Excel_Files")
 
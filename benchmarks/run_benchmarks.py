@@ -0,0 +1,174 @@
+"""
+Times the conversion stages on synthetic survey workbooks and records the results to catch regressions.
+
+    python benchmarks/run_benchmarks.py --rows 5000 --images 100 --repeat 3
+    python benchmarks/run_benchmarks.py --compare
+    python benchmarks/run_benchmarks.py --output benchmarks/baseline.json
+
+Runs offline and without the GUI. Generated workbooks are cached in --workbook-dir. --compare without a file
+compares against the committed benchmarks/baseline.json; the third line records a new one.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import warnings
+
+if not __package__:
+    # Run as a script rather than with -m: the repository root is not on the path yet
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_workbook import ensure_workbook, parse_size
+from src.converter_worker import ExcelConverter
+from src.converter_service import Process
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+# Committed, unlike the results folder, so every checkout has something to compare against
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ["load_excel_file", "clean_dataframes", "extract_images", "build_geodataframes",
+          "convert_to_geojson", "convert_to_shapefile", "process_folder"]
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def time_converter_stages(workbook_path, output_folder):
+    """
+    Runs one file through ExcelConverter stage by stage and returns {stage: seconds}.
+
+    extract_images runs inside clean_dataframes, so its time comes from the converter's stage metrics.
+    """
+    converter = ExcelConverter(output_folder)
+    timings = {}
+    try:
+        timings["load_excel_file"] = timed(converter.load_excel_file, workbook_path)
+        timings["clean_dataframes"] = timed(converter.clean_dataframes, workbook_path)
+    finally:
+        converter.close()
+    timings["extract_images"] = sum(record["wall_s"] for record in converter.metrics.records if record["stage"] == "images")
+    timings["build_geodataframes"] = timed(converter.build_geodataframes)
+    timings["convert_to_geojson"] = timed(converter.convert_to_geojson, output_folder)
+    timings["convert_to_shapefile"] = timed(converter.convert_to_shapefile, output_folder)
+    return timings
+
+def time_process_folder(workbook_paths, output_folder, workers):
+    input_folder = os.path.join(output_folder, "input")
+    os.makedirs(input_folder)
+    for workbook_path in workbook_paths:
+        target = os.path.join(input_folder, os.path.basename(workbook_path))
+        try:
+            os.link(workbook_path, target)
+        except OSError:
+            shutil.copy(workbook_path, target)
+    processor = Process(output_folder, workers=workers)
+    return timed(processor.process_folder, input_folder)
+
+def summarize(samples):
+    return {
+        "min": round(min(samples), 6),
+        "median": round(statistics.median(samples), 6),
+        "mean": round(statistics.fmean(samples), 6),
+        "runs": len(samples),
+    }
+
+def environment():
+    import pandas
+    import geopandas
+    import openpyxl
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pandas.__version__,
+        "geopandas": geopandas.__version__,
+        "openpyxl": openpyxl.__version__,
+    }
+
+def run(args):
+    workbook_folder = args.workbook_dir or os.path.join(tempfile.gettempdir(), "converter_benchmark_workbooks")
+    workbook_paths = [ensure_workbook(workbook_folder, args.sheets, args.rows, args.images, args.image_size, seed)
+                      for seed in range(args.files)]
+
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(args.repeat):
+        # Fresh output folders every run, so the image store never answers from a previous run
+        with tempfile.TemporaryDirectory() as output_folder:
+            for stage, seconds in time_converter_stages(workbook_paths[0], output_folder).items():
+                samples[stage].append(seconds)
+        with tempfile.TemporaryDirectory() as output_folder:
+            samples["process_folder"].append(time_process_folder(workbook_paths, output_folder, args.workers))
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "parameters": {
+            "sheets": args.sheets, "rows": args.rows, "images": args.images,
+            "image_size": list(args.image_size), "files": args.files, "workers": args.workers,
+        },
+        "results": {stage: summarize(stage_samples) for stage, stage_samples in samples.items()},
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Returns the stages whose median is more than `threshold` times the baseline median.
+    """
+    if baseline["parameters"] != results["parameters"]:
+        print("⚠️ Warning: baseline was recorded with different parameters, comparison is indicative only.")
+    regressions = []
+    for stage, result in results["results"].items():
+        reference = baseline["results"].get(stage)
+        if not reference or not reference["median"]:
+            continue
+        ratio = result["median"] / reference["median"]
+        print(f"{stage:<22} {reference['median']:>10.4f}s -> {result['median']:>10.4f}s  x{ratio:.2f}")
+        if ratio > threshold:
+            regressions.append(stage)
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Benchmark the Excel to GIS conversion stages.")
+    parser.add_argument("--sheets", type=int, default=2, help="sheets per workbook (default: 2)")
+    parser.add_argument("--rows", type=int, default=2000, help="data rows per sheet (default: 2000)")
+    parser.add_argument("--images", type=int, default=50, help="images per sheet (default: 50)")
+    parser.add_argument("--image-size", type=parse_size, default=(640, 480), help="WIDTHxHEIGHT (default: 640x480)")
+    parser.add_argument("--files", type=int, default=4, help="workbooks in the process_folder benchmark (default: 4)")
+    parser.add_argument("--workers", type=int, default=1, help="workers for process_folder (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (default: 3)")
+    parser.add_argument("--workbook-dir", help="where generated workbooks are cached (default: a temp folder)")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_FILE,
+                        help="baseline results file to compare against (default without a file: benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown factor of the median that counts as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    # Shapefile field name truncation warnings are expected for the survey headers
+    warnings.filterwarnings("ignore", category=UserWarning)
+    warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+    results = run(args)
+    for stage, result in results["results"].items():
+        print(f"{stage:<22} median {result['median']:.4f}s  min {result['min']:.4f}s")
+
+    output = args.output or os.path.join(RESULTS_FOLDER, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"❌ Regression in: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Generates survey workbooks in the layout the converter expects, for benchmarks.
+
+    python -m benchmarks.synthetic_workbook OUTPUT.xlsx --sheets 2 --rows 5000 --images 200
+"""
+import io
+import os
+import random
+import argparse
+import openpyxl
+from openpyxl.drawing.image import Image as XLImage
+from PIL import Image
+
+# (level 1, level 2, level 3) of each column in header rows 3-5; None stands for a merged cell
+HEADER = [
+    ("NO", None, None),
+    ("DETAIL LOKASI", None, None),
+    ("DOKUMENTASI", None, None),
+    ("TITIK KORDINAT", "Latitude", None),
+    (None, "Longitude", None),
+    ("JENIS RAMBU", "Peringatan", "Tikungan"),
+    (None, None, "Persimpangan"),
+    (None, "Larangan", "Parkir"),
+    (None, None, "Berhenti"),
+    (None, "Perintah", "Kecepatan"),
+    ("LOKASI PEMASANGAN", "Kiri", None),
+    (None, "Kanan", None),
+    (None, "Median", None),
+    ("KONDISI", None, None),
+    ("KETERANGAN", None, None),
+    ("Rekap", "Jumlah", None),
+]
+DOKUMENTASI_COLUMN = 3
+FIRST_DATA_ROW = 6
+BINARY_COLUMNS = range(6, 14)
+# Roughly Kabupaten Bandung, so the points land somewhere plausible
+LATITUDE_RANGE = (-7.25, -6.85)
+LONGITUDE_RANGE = (107.35, 107.85)
+
+def workbook_name(sheets, rows, images, image_size, seed):
+    width, height = image_size
+    return f"survey_s{sheets}_r{rows}_i{images}_{width}x{height}_seed{seed}.xlsx"
+
+def make_image(rng, image_size, index):
+    """
+    Returns a noisy, tinted image as JPEG bytes (every fourth one as PNG), so no two images deduplicate.
+    """
+    width, height = image_size
+    # Coarse noise scaled up compresses about like a photo, unlike per-pixel noise
+    coarse = (width // 8 + 1, height // 8 + 1)
+    noise = Image.frombytes("L", coarse, rng.randbytes(coarse[0] * coarse[1])).resize((width, height), Image.BILINEAR).convert("RGB")
+    tint = Image.new("RGB", (width, height), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    image = Image.blend(noise, tint, 0.5)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG" if index % 4 == 3 else "JPEG", quality=85)
+    return buffer.getvalue()
+
+def make_workbook(path, sheets = 2, rows = 1000, images = 50, image_size = (640, 480), seed = 0, invalid_ratio = 0.01):
+    """
+    Writes a synthetic survey workbook to path and returns path.
+
+    Every sheet has a title in row 1, the 3-level header in rows 3-5, `rows` data rows from row 6 and
+    `images` images anchored in column C, spread evenly over the data rows. A share of invalid_ratio
+    rows gets missing or out of range coordinates. The same arguments always produce the same data.
+    """
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(f"RAMBU {sheet_index + 1}")
+        sheet.append([f"DATA RAMBU JALAN RUAS {sheet_index + 1}"])
+        sheet.append([])
+        for level in range(3):
+            sheet.append([column[level] for column in HEADER])
+
+        image_count = min(images, rows)
+        step = rows / image_count if image_count else 0
+        for image_index in range(image_count):
+            row = FIRST_DATA_ROW + int(image_index * step)
+            image = XLImage(io.BytesIO(make_image(rng, image_size, sheet_index * images + image_index)))
+            image.width, image.height = 96, 72
+            sheet.add_image(image, f"C{row}")
+
+        for row_index in range(rows):
+            latitude = round(rng.uniform(*LATITUDE_RANGE), 7)
+            longitude = round(rng.uniform(*LONGITUDE_RANGE), 7)
+            if rng.random() < invalid_ratio:
+                latitude, longitude = rng.choice([(None, None), (latitude, 200.0), ("-", longitude)])
+            values = [
+                row_index + 1,
+                f"KM {row_index // 10}+{row_index % 10}00" if row_index % 3 else None,
+                None,
+                latitude,
+                longitude,
+            ]
+            values += [1 if rng.random() < 0.3 else None for _ in BINARY_COLUMNS]
+            values += [rng.choice(["Baik", "Rusak Ringan", "Rusak Berat"]), rng.choice(["", "Perlu diganti", "Tertutup pohon"]), 1]
+            sheet.append(values)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    workbook.save(path)
+    return path
+
+def ensure_workbook(folder, sheets = 2, rows = 1000, images = 50, image_size = (640, 480), seed = 0):
+    """
+    Returns the path of a cached synthetic workbook in folder, generating it on first use.
+    """
+    path = os.path.join(folder, workbook_name(sheets, rows, images, image_size, seed))
+    if not os.path.exists(path):
+        make_workbook(path, sheets, rows, images, image_size, seed)
+    return path
+
+def parse_size(value):
+    width, _, height = value.partition("x")
+    return int(width), int(height)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic survey workbook.")
+    parser.add_argument("output")
+    parser.add_argument("--sheets", type=int, default=2)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--images", type=int, default=50, help="images per sheet")
+    parser.add_argument("--image-size", type=parse_size, default=(640, 480), help="WIDTHxHEIGHT")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    make_workbook(args.output, args.sheets, args.rows, args.images, args.image_size, args.seed)
@@ -0,0 +1,276 @@
+# This Python file uses the following encoding: utf-8
+"""
+Headless entry point: converts Excel survey workbooks without the PyQt6 GUI.
+
+    python cli.py INPUT [INPUT ...] -o OUTPUT_DIR [-f geojson,gpkg] [-w 8] [--incremental]
+    python cli.py split LAYER -k KEY [-k KEY ...] -o OUTPUT_DIR [--layout layers] [--index jalan_kabupaten.xlsx]
+    python cli.py serve -o JOBS_DIR [--port 8765] [-w 4] [--allow-path Data/Excel_Files]
+"""
+import os
+import sys
+import warnings
+import argparse
+import multiprocessing
+
+from src.formats import OUTPUT_FORMATS, DEFAULT_FORMATS, BOUNDING_BOXES, missing_requirement
+from src.sheet_cache import DEFAULT_CACHE_MB
+
+def silence_warnings():
+    """
+    Hides the warnings expected for the survey headers (shapefile field names truncated and laundered), here
+    and, through PYTHONWARNINGS, in the worker processes, which start with the filters of a fresh interpreter.
+    """
+    warnings.filterwarnings("ignore", category=UserWarning)
+    warnings.filterwarnings("ignore", category=RuntimeWarning)
+    os.environ["PYTHONWARNINGS"] = "ignore::UserWarning,ignore::RuntimeWarning"
+
+def parse_formats(value):
+    formats = [output_format.strip() for output_format in value.split(",") if output_format.strip()]
+    unknown = [output_format for output_format in formats if output_format not in OUTPUT_FORMATS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(f"choose from: {', '.join(OUTPUT_FORMATS)}")
+    for output_format in formats:
+        missing = missing_requirement(output_format)
+        if missing:
+            raise argparse.ArgumentTypeError(f"{output_format} needs {missing}, which is not installed (pip install {missing})")
+    return formats
+
+def parse_bbox(value):
+    if value in BOUNDING_BOXES:
+        return BOUNDING_BOXES[value]
+    try:
+        bbox = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        bbox = ()
+    if len(bbox) != 4 or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+        raise argparse.ArgumentTypeError(f"expected MIN_LON,MIN_LAT,MAX_LON,MAX_LAT or one of: {', '.join(BOUNDING_BOXES)}")
+    return bbox
+
+def derivative_specs(value):
+    from src.image_derivatives import parse_derivatives
+
+    try:
+        return parse_derivatives(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Convert survey Excel workbooks to GeoJSON, Shapefile and other GIS formats.",
+                                     epilog="Run 'cli.py split --help' to split a vector layer by key columns, "
+                                            "'cli.py serve --help' to run the local conversion job service.")
+    parser.add_argument("inputs", nargs="+", help="Excel files and/or folders containing .xlsx/.xls files")
+    parser.add_argument("-o", "--output-dir", required=True, help="folder in which converted_output/ is created")
+    parser.add_argument("-f", "--formats", type=parse_formats, default=list(DEFAULT_FORMATS),
+                        help=f"comma separated output formats ({', '.join(OUTPUT_FORMATS)}); default: {','.join(DEFAULT_FORMATS)}")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes, 0 for all cores (default: 1)")
+    parser.add_argument("--incremental", action="store_true", help="skip inputs whose outputs are up to date")
+    parser.add_argument("--image-mode", choices=("raw", "decode"), default="raw",
+                        help="copy embedded images as they are (raw) or re-encode them as JPEG (decode)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="convert sheets in chunks of rows instead of loading whole workbooks (for very large files)")
+    parser.add_argument("--chunk-rows", type=int, default=10000, help="rows per chunk in streaming mode (default: 10000)")
+    parser.add_argument("--memory-limit", type=int, metavar="MB",
+                        help="in streaming mode, shrink chunks while a process uses more than this many MB")
+    parser.add_argument("--sheet-cache", type=int, nargs="?", const=DEFAULT_CACHE_MB, metavar="MB",
+                        help="keep the parsed sheets of each input (Parquet, needs pyarrow) so re-exports skip reading the workbook; "
+                             f"the least recently used are removed beyond MB (default: {DEFAULT_CACHE_MB})")
+    parser.add_argument("--roads", metavar="LAYER",
+                        help="road layer (e.g. SHP JALAN PROVINSI.shp with 'nama jalan' and 'kabupaten/') to snap every point to, "
+                             "adding its road name, kabupaten and chainage")
+    parser.add_argument("--snap-tolerance", type=float, default=25.0, metavar="M",
+                        help="with --roads, points farther than this many metres from any road get no road (default: 25)")
+    parser.add_argument("--bbox", type=parse_bbox, metavar="BOX",
+                        help=f"reject points outside MIN_LON,MIN_LAT,MAX_LON,MAX_LAT or a named box ({', '.join(BOUNDING_BOXES)})")
+    parser.add_argument("--crs", dest="target_crs", metavar="CRS",
+                        help="reproject the outputs to this CRS, e.g. EPSG:32748 (UTM 48S); default: EPSG:4326")
+    parser.add_argument("--derivatives", type=derivative_specs, metavar="SPECS",
+                        help="also write downscaled images and add their paths as DOK_<NAME> columns: thumb (256 px JPEG), "
+                             "web (1280 px WebP) or NAME:SIZE[:jpeg|webp[:QUALITY]], comma separated")
+    parser.add_argument("--report", action="store_true", help="write run_report.json/.csv with per-stage timings and memory")
+    parser.add_argument("--profile", choices=("cprofile", "tracemalloc"),
+                        help="profile each input, writing the results to converted_output/profiles")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and convert workbooks as they arrive in the (single) input folder; implies --incremental")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="in watch mode, seconds a file must stay unchanged before it is converted (default: 2)")
+    parser.add_argument("--poll", action="store_true",
+                        help="in watch mode, rescan the folder instead of using file system events (for network shares)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors and the final summary")
+    return parser
+
+def build_split_parser():
+    parser = argparse.ArgumentParser(prog="cli.py split", description="Split a vector layer into one output per value of key columns.")
+    parser.add_argument("layer", help="any vector file GDAL reads (shapefile, GeoPackage, GeoJSON...)")
+    parser.add_argument("-k", "--key", action="append", required=True, dest="keys",
+                        help="key column; repeat for nested folders, e.g. -k kabupaten/ -k 'nama jalan'")
+    parser.add_argument("-o", "--output-dir", required=True, help="folder the partitions and the index are written to")
+    parser.add_argument("-f", "--format", choices=("shapefile", "geojson", "gpkg", "fgb"), default="shapefile",
+                        help="format of the partition files (default: shapefile)")
+    parser.add_argument("--layout", choices=("files", "layers"), default="files",
+                        help="one file per partition, or one layer per partition in partitions.gpkg (default: files)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes, 0 for all cores (default: 1)")
+    parser.add_argument("--index", default="partition_index.xlsx", help="name of the Excel index of the partitions (default: partition_index.xlsx)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    return parser
+
+def split_main(argv):
+    args = build_split_parser().parse_args(argv)
+    if args.quiet:
+        silence_warnings()
+
+    from src.partition import PartitionedExport
+
+    exporter = PartitionedExport(args.output_dir, args.keys, output_format=args.format, layout=args.layout,
+                                 workers=args.workers, index_name=args.index,
+                                 log_callback=None if args.quiet else lambda message: print(message, flush=True))
+    try:
+        exporter.export(args.layer)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}", file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("Split canceled.", file=sys.stderr)
+        return 130
+    return 0
+
+def build_serve_parser():
+    parser = argparse.ArgumentParser(prog="cli.py serve",
+                                     description="Run a local HTTP service that converts submitted workbooks on warm worker processes.")
+    parser.add_argument("-o", "--jobs-dir", required=True, help="folder the uploads and outputs of every job are kept in")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1, this machine only)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on, 0 for any free port (default: 8765)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of worker processes, 0 for all cores (default: 1)")
+    parser.add_argument("-f", "--formats", type=parse_formats, default=list(DEFAULT_FORMATS),
+                        help=f"output formats of jobs that do not choose their own; default: {','.join(DEFAULT_FORMATS)}")
+    parser.add_argument("--image-mode", choices=("raw", "decode"), default="raw",
+                        help="copy embedded images as they are (raw) or re-encode them as JPEG (decode)")
+    parser.add_argument("--streaming", action="store_true", help="convert sheets in chunks of rows (for very large files)")
+    parser.add_argument("--max-queued", type=int, default=16, help="jobs that may wait or run at once; more are refused (default: 16)")
+    parser.add_argument("--max-upload", type=int, default=512, metavar="MB", help="largest accepted upload (default: 512)")
+    parser.add_argument("--allow-path", action="append", default=[], dest="allowed_roots", metavar="DIR",
+                        help="accept jobs naming workbooks on this machine under DIR (repeatable); by default only uploads are accepted")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    return parser
+
+def serve_main(argv):
+    args = build_serve_parser().parse_args(argv)
+    if args.quiet:
+        silence_warnings()
+
+    from src.job_service import JobService, JobServer
+
+    def log(message):
+        if not args.quiet or message.startswith("❌"):
+            print(message, flush=True)
+
+    service = JobService(args.jobs_dir, workers=args.workers, formats=args.formats, max_queued=args.max_queued,
+                         allowed_roots=args.allowed_roots, max_upload_mb=args.max_upload, log_callback=log,
+                         image_mode=args.image_mode, streaming=args.streaming)
+    try:
+        server = JobServer(service, args.host, args.port)
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 2
+    service.start()
+    log(f"Serving conversion jobs on {server.url}. Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+    return 0
+
+def collect_inputs(inputs):
+    """
+    Expands folders to the Excel files they contain, keeping the order given on the command line.
+    """
+    file_paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            file_paths.extend(os.path.join(path, f) for f in sorted(os.listdir(path)) if f.endswith((".xlsx", ".xls")))
+        elif os.path.isfile(path):
+            file_paths.append(path)
+        else:
+            raise FileNotFoundError(f"Input not found: {path}")
+    return file_paths
+
+def main(argv = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "split":
+        return split_main(argv[1:])
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+    args = build_parser().parse_args(argv)
+    if args.quiet:
+        silence_warnings()
+
+    # Imported after argument parsing so --help never pays for it
+    from src.converter_service import Process
+    from src.cancellation import ConversionCancelled
+
+    def log(message):
+        if not args.quiet or message.startswith(("❌", "Batch processing")):
+            print(message, flush=True)
+
+    if args.roads and not os.path.isfile(args.roads):
+        print(f"Road layer not found: {args.roads}", file=sys.stderr)
+        return 2
+    if args.target_crs:
+        from pyproj import CRS
+        from pyproj.exceptions import CRSError
+
+        try:
+            CRS.from_user_input(args.target_crs)
+        except CRSError as e:
+            print(f"Invalid --crs: {e}", file=sys.stderr)
+            return 2
+
+    if args.watch:
+        if len(args.inputs) != 1 or os.path.isfile(args.inputs[0]):
+            print("--watch takes a single input folder", file=sys.stderr)
+            return 2
+        return watch(args, log)
+
+    try:
+        file_paths = collect_inputs(args.inputs)
+    except FileNotFoundError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    processor = Process(args.output_dir, image_mode=args.image_mode, workers=args.workers,
+                        formats=args.formats, incremental=args.incremental,
+                        report=args.report, profile=args.profile, streaming=args.streaming,
+                        chunk_rows=args.chunk_rows, memory_limit_mb=args.memory_limit, sheet_cache_mb=args.sheet_cache,
+                        roads=args.roads, snap_tolerance=args.snap_tolerance, bbox=args.bbox, target_crs=args.target_crs,
+                        derivatives=args.derivatives)
+    try:
+        failed = processor.process_files(file_paths, log)
+    except (KeyboardInterrupt, ConversionCancelled):
+        processor.cancel_token.cancel()
+        print("Conversion canceled.", file=sys.stderr)
+        return 130
+    return 1 if failed else 0
+
+def watch(args, log):
+    from src.converter_service import Process
+    from src.folder_watcher import FolderWatcher
+
+    # A restarted watcher must not convert the whole folder again
+    processor = Process(args.output_dir, image_mode=args.image_mode, workers=args.workers,
+                        formats=args.formats, incremental=True,
+                        report=args.report, profile=args.profile, streaming=args.streaming,
+                        chunk_rows=args.chunk_rows, memory_limit_mb=args.memory_limit, sheet_cache_mb=args.sheet_cache,
+                        roads=args.roads, snap_tolerance=args.snap_tolerance, bbox=args.bbox, target_crs=args.target_crs,
+                        derivatives=args.derivatives)
+    watcher = FolderWatcher(processor, args.inputs[0], log_callback=log, debounce_seconds=args.debounce, poll=args.poll)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
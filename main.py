@@ -1,45 +1,62 @@
 # This Python file uses the following encoding: utf-8
+import os
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication, QMainWindow, QFileDialog, QMessageBox
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
 from ui.ui_main import Ui_Main
 
 from src.converter_service import Process
+from src.cancellation import CancellationToken, ConversionCancelled
+from src.progress_channel import ProgressChannel
+from src.formats import missing_requirement
+
+# The log and progress bar are redrawn at most this often, however fast the workers report
+FRAME_INTERVAL_MS = 100
 
 class ConversionThread(QThread):
-    progress = pyqtSignal(int)
-    log_message = pyqtSignal(str)
+    """
+    Runs a conversion off the UI thread. Log lines and progress go through `channel`, which the window
+    reads on a timer; every line is also kept in converted_output/conversion.log.
+    """
     finished = pyqtSignal()
 
-    def __init__(self, file_path = None, directory_path = None, out_directory_path = None) -> None:
+    def __init__(self, file_path = None, directory_path = None, out_directory_path = None, workers = None, formats = None) -> None:
         super().__init__()
         self.file_path = file_path
         self.directory_path = directory_path
         self.out_directory_path = out_directory_path
-        self.running = True
+        self.workers = workers or os.cpu_count()
+        self.formats = formats or ["geojson", "shapefile"]
+        self.cancel_token = CancellationToken()
+        self.channel = ProgressChannel(os.path.join(out_directory_path, "converted_output", "conversion.log"))
 
     def run(self):
-        processor = Process(self.out_directory_path, self.progress.emit)
         try:
+            processor = Process(self.out_directory_path, workers=self.workers, formats=self.formats,
+                                cancel_token=self.cancel_token, channel=self.channel)
             if self.file_path:
-                self.log_message.emit(f"Processing file: {self.file_path}")
+                self.log_callback(f"Processing file: {self.file_path}")
                 processor.process_single_file(self.file_path, self.log_callback) #add out_directory_path?
             elif self.directory_path:
-                self.log_message.emit(f"Processing directory: {self.directory_path}")
+                self.log_callback(f"Processing directory: {self.directory_path}")
                 processor.process_folder(self.directory_path, self.log_callback) #add out_directory_path?
-            self.log_message.emit("Conversion completed!")
+            self.log_callback("Conversion completed!")
+        except ConversionCancelled:
+            self.log_callback("Conversion canceled.")
         except Exception as e:
-            self.log_message.emit(f"Error: {str(e)}")
+            self.log_callback(f"Error: {str(e)}")
         finally:
             self.finished.emit()
 
     def log_callback(self, message):
-        self.log_message.emit(message)
+        self.channel.log(message)
 
     def stop(self):
-        self.running = False
-        self.quit()
-        self.wait()
+        """
+        Asks the conversion to stop at its next check; finished is emitted once it has cleaned up.
+        """
+        self.cancel_token.cancel()
 
 class Main(QMainWindow):
     def __init__(self, parent=None):
@@ -59,8 +76,20 @@ class Main(QMainWindow):
         self.ui.btnCancel.clicked.connect(self.cancel_conversion)
         self.ui.tabWidget.currentChanged.connect(self.on_tab_changed)
 
+        # GeoParquet is written through pyarrow, an optional package
+        missing = missing_requirement("parquet")
+        if missing:
+            message = f"GeoParquet output needs {missing}, which is not installed (pip install {missing})."
+            self.ui.chkGeoParquet.setChecked(False)
+            self.ui.chkGeoParquet.setEnabled(False)
+            self.ui.chkGeoParquet.setToolTip(message)
+            self.ui.textLog.append(message)
+
         # Initialize thread reference
         self.conversion_thread = None
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setInterval(FRAME_INTERVAL_MS)
+        self.frame_timer.timeout.connect(self.show_progress)
 
     def browse_single_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Select Excel File", "", "Excel Files (*.xls *.xlsx)")
@@ -88,6 +117,16 @@ class Main(QMainWindow):
             self.ui.singleFilePath.clear()
             self.ui.singleOutDir.clear()
 
+    def selected_formats(self):
+        checkboxes = {
+            "geojson": self.ui.chkGeoJSON,
+            "shapefile": self.ui.chkShapefile,
+            "gpkg": self.ui.chkGeoPackage,
+            "fgb": self.ui.chkFlatGeobuf,
+            "parquet": self.ui.chkGeoParquet,
+        }
+        return [output_format for output_format, checkbox in checkboxes.items() if checkbox.isChecked()]
+
     def start_conversion(self):
         file_path = self.ui.singleFilePath.text().strip()
         directory_path = self.ui.bulkBrowseDir.text().strip()
@@ -103,6 +142,11 @@ class Main(QMainWindow):
             QMessageBox.warning(self, "Error", "Please select output directory first.")
             return
 
+        formats = self.selected_formats()
+        if not formats:
+            QMessageBox.warning(self, "Error", "Please select at least one output format.")
+            return
+
         self.ui.btnConvert.setEnabled(False)
         self.ui.btnCancel.setEnabled(True)
         self.ui.textLog.append("Starting conversion...")
@@ -110,26 +154,44 @@ class Main(QMainWindow):
         # Create and start the conversion thread
         self.conversion_thread = ConversionThread(file_path=file_path if file_path else None, 
                                                   directory_path=directory_path if directory_path else None,
-                                                  out_directory_path=out_directory_path)
-        self.conversion_thread.progress.connect(self.ui.progressBar.setValue)
-        self.conversion_thread.log_message.connect(self.ui.textLog.append)
+                                                  out_directory_path=out_directory_path,
+                                                  formats=formats)
         self.conversion_thread.finished.connect(self.conversion_finished)
+        self.frame_timer.start()
         self.conversion_thread.start()
 
+    def show_progress(self):
+        """
+        Shows what the conversion reported since the last frame, with one append for all the new lines.
+        """
+        channel = self.conversion_thread.channel
+        frame = channel.frame()
+        if frame.skipped:
+            frame.lines.insert(0, f"... {frame.skipped} line(s) not shown, see {channel.log_path}")
+        if frame.lines:
+            self.ui.textLog.append("\n".join(frame.lines))
+        self.ui.progressBar.setValue(frame.overall)
+        self.ui.statusbar.showMessage("  |  ".join(f"{os.path.basename(file_path)}: {stage or 'starting'} {percent}%"
+                                                   for file_path, (percent, stage) in frame.active.items()))
+
     def cancel_conversion(self):
         if self.conversion_thread:
             self.conversion_thread.stop()
-            self.ui.textLog.append("Converion canceled.")
-            self.ui.btnConvert.setEnabled(True)
+            self.ui.textLog.append("Canceling conversion...")
             self.ui.btnCancel.setEnabled(False)
 
     def conversion_finished(self):
+        self.frame_timer.stop()
+        self.show_progress()
+        self.conversion_thread.channel.close()
+        self.ui.statusbar.clearMessage()
         self.ui.textLog.append("Converision finished.")
         self.ui.btnConvert.setEnabled(True)
         self.ui.btnCancel.setEnabled(False)
         self.ui.progressBar.setValue(0)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     widget = Main()
     widget.show()
@@ -0,0 +1,33 @@
+import threading
+
+class ConversionCancelled(Exception):
+    """
+    Raised inside a conversion when its CancellationToken has been cancelled.
+    """
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag checked between sheets, row blocks, images and output chunks.
+
+    Wraps a threading.Event by default; pass a multiprocessing.Event to share it with pool processes.
+    """
+    def __init__(self, event = None) -> None:
+        self.event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def raise_if_cancelled(self):
+        if self.event.is_set():
+            raise ConversionCancelled("Conversion canceled.")
+
+def raise_if_cancelled(cancel_token):
+    """
+    Convenience check for code paths where a token is optional.
+    """
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
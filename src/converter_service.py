@@ -1,47 +1,285 @@
 import os
-from src.converter_worker import ExcelConverter
+from src.formats import DEFAULT_FORMATS, CONVERTER_VERSION
+from src.manifest import ConversionManifest, file_sha256
+from src.cancellation import CancellationToken, ConversionCancelled
+from src.instrumentation import StageMetrics, RunReport, PROFILE_MODES
+from src.progress_channel import ProgressAggregator
+from src.worker_pool import ConversionPool
+
+def _excel_converter(*args, **kwargs):
+    # Imported on first use, so importing the service (CLI --help, no-op incremental runs)
+    # does not pay for pandas, geopandas and openpyxl
+    from src.converter_worker import ExcelConverter
+    return ExcelConverter(*args, **kwargs)
 
 class Process:
-    def __init__(self, output_folder, progress_callback = None) -> None:
+    def __init__(self, output_folder, progress_callback = None, image_mode = "raw", workers = 1, formats = DEFAULT_FORMATS, incremental = False, cancel_token = None, report = False, profile = None,
+                 streaming = False, chunk_rows = 10000, memory_limit_mb = None, channel = None, sheet_cache_mb = None,
+                 roads = None, snap_tolerance = 25.0, bbox = None, target_crs = None,
+                 derivatives = None, relative_image_paths = False) -> None:
         self.output_folder = output_folder + "/converted_output"
         self.progress_callback = progress_callback
+        # Optional ProgressChannel that also receives the progress of every file, with its stage
+        self.channel = channel
+        self.file_progress = ProgressAggregator()
+        self.image_mode = image_mode
+        # Passed to every ExcelConverter; the memory limit applies to each worker process on its own
+        self.converter_options = {"image_mode": image_mode, "streaming": streaming, "chunk_rows": chunk_rows, "memory_limit_mb": memory_limit_mb,
+                                  "sheet_cache_mb": sheet_cache_mb, "roads": roads, "snap_tolerance": snap_tolerance,
+                                  "bbox": bbox, "target_crs": target_crs, "derivatives": derivatives,
+                                  "relative_image_paths": relative_image_paths}
+        self.formats = tuple(formats)
+        self.workers = workers or os.cpu_count() or 1
+        self.cancel_token = cancel_token or CancellationToken()
         os.makedirs(self.output_folder, exist_ok=True)
+        self.manifest = ConversionManifest(self.output_folder, self._converter_version(self.converter_options)) if incremental else None
+        if profile not in (None, *PROFILE_MODES):
+            raise ValueError(f"Unknown profile mode '{profile}'. Choose from: {', '.join(PROFILE_MODES)}")
+        self.report = RunReport() if report else None
+        self.profile = profile  # profiler output goes to converted_output/profiles
 
-    def process_single_file(self, file_path, log_callback = None):
+    @staticmethod
+    def _converter_version(converter_options):
+        """
+        Version recorded in the manifest: another image mode (DOKUMENTASI points to raw or re-encoded
+        images), bounding box, target CRS, road layer, snapping tolerance, set of image derivatives or
+        relative image paths changes every output. Streaming, chunk size, memory limit and the sheet cache do not.
         """
-        Processes a single Excel file and converts it to GeoJSON and Shapefile.
+        version = f"{CONVERTER_VERSION}+image_mode:{converter_options['image_mode']}"
+        if converter_options["bbox"]:
+            version += "+bbox:" + ",".join(f"{value:g}" for value in converter_options["bbox"])
+        if converter_options["target_crs"]:
+            version += f"+crs:{converter_options['target_crs']}"
+        if converter_options["derivatives"]:
+            version += "+images:" + ",".join(repr(spec) for spec in converter_options["derivatives"])
+        if converter_options["relative_image_paths"]:
+            version += "+relative_images"
+        roads = converter_options["roads"]
+        if roads:
+            paths = [roads]
+            if roads.lower().endswith(".shp"):
+                paths.append(os.path.splitext(roads)[0] + ".dbf")
+            fingerprint = "".join(file_sha256(path)[:12] for path in paths if os.path.exists(path))
+            version += f"+roads:{fingerprint}:{converter_options['snap_tolerance']:g}"
+        return version
+
+    def _update_progress(self, percent):
+        if self.progress_callback:
+            self.progress_callback(int(percent))
+
+    def _start_progress(self, file_paths):
+        self.file_progress.start(file_paths)
+        if self.channel is not None:
+            self.channel.start_batch(file_paths)
+
+    def _report_file_progress(self, file_path, percent, stage = None):
         """
+        Records the progress of one file of the batch and reports the overall progress.
+        """
+        if self.channel is not None:
+            self.channel.file_progress(file_path, percent, stage)
+        self._update_progress(self.file_progress.update(file_path, percent, stage))
+
+    def _track_file_progress(self, converter, file_path):
+        """
+        Routes the progress of the converter of file_path, with its current stage, into the batch progress.
+        """
+        tracker = converter.progress
+        tracker.callback = lambda percent: self._report_file_progress(file_path, percent, tracker.stage)
+        return converter
+
+    @staticmethod
+    def convert_file(converter, file_path, formats = DEFAULT_FORMATS):
+        """
+        Runs every conversion stage of one file on the given converter and returns the outputs it wrote.
+        """
+        with converter.metrics.profiling(file_path):
+            if converter.streaming:
+                try:
+                    converter.convert_streaming(file_path, converter.output_folder, formats)
+                finally:
+                    converter.close()
+                converter.write_rejected_records(converter.output_folder)
+                return converter.outputs
+
+            try:
+                if not converter.load_cached(file_path):
+                    converter.load_excel_file(file_path)
+                    converter.clean_dataframes(file_path)
+                    converter.cache_sheets()
+            finally:
+                converter.close()
+
+            converter.build_geodataframes()
+            converter.convert(converter.output_folder, formats)
+            converter.write_rejected_records(converter.output_folder)
+        return converter.outputs
+
+    def _metrics(self):
+        return StageMetrics(self.profile, os.path.join(self.output_folder, "profiles"))
+
+    def add_to_report(self, file_path, records, status):
+        if self.report is not None:
+            self.report.add(file_path, records, status)
+
+    def write_report(self, log_callback):
+        if self.report is None:
+            return
+        report_path = self.report.write(self.output_folder)
         if log_callback:
-            log_callback(f"Processing file: {file_path}")
+            log_callback(f"📊 Run report written to {report_path}")
+
+    def pending_formats(self, file_path, log_callback):
+        """
+        Returns the formats to write for file_path: all of them, or in incremental mode only the stale ones.
+        """
+        if self.manifest is None:
+            return list(self.formats)
+        formats = self.manifest.formats_to_write(file_path, self.formats)
+        if not formats and log_callback:
+            log_callback(f"⏭️ Skipping unchanged file: {os.path.basename(file_path)}")
+        return formats
 
-        converter = ExcelConverter(self.output_folder, log_callback, self.progress_callback)
+    def record(self, file_path, outputs):
+        if self.manifest is not None:
+            self.manifest.record(file_path, outputs)
+            self.manifest.save()
 
-        converter.load_excel_file(file_path)
-        converter.clean_dataframes(file_path)
+    def process_single_file(self, file_path, log_callback = None):
+        """
+        Processes a single Excel file and converts it to the configured output formats.
+        """
+        self._start_progress([file_path])
+        formats = self.pending_formats(file_path, log_callback)
+        if not formats:
+            self._report_file_progress(file_path, 100)
+            return
 
-        converter.convert_to_geojson(self.output_folder)
-        converter.convert_to_shapefile(self.output_folder)
+        if log_callback:
+            log_callback(f"Processing file: {file_path}")
+
+        converter = _excel_converter(self.output_folder, log_callback, cancel_token=self.cancel_token, metrics=self._metrics(), **self.converter_options)
+        self._track_file_progress(converter, file_path)
+        status = "failed"
+        try:
+            self.record(file_path, self.convert_file(converter, file_path, formats))
+            status = "ok"
+        except ConversionCancelled:
+            status = "cancelled"
+            raise
+        finally:
+            self.add_to_report(file_path, converter.metrics.records, status)
+            self.write_report(log_callback)
 
         if log_callback:
             log_callback(f"Finished processing {file_path}")
 
     def process_folder(self, input_folder, log_callback = None):
         """
-        Processes all Excel files in a folder.
+        Processes all Excel files in a folder, in parallel when more than one worker is configured.
+
+        Raises ConversionCancelled once the cancel token is set; files already converted are kept.
+        """
+        files = [os.path.join(input_folder, f) for f in os.listdir(input_folder) if f.endswith((".xlsx", ".xls"))]
+        return self.process_files(files, log_callback)
+
+    def process_files(self, file_paths, log_callback = None):
+        """
+        Processes a list of Excel files and returns the paths of those that failed.
         """
-        files = [f for f in os.listdir(input_folder) if f.endswith((".xlsx", ".xls"))]
-        total_files = len(files)
+        self._start_progress(file_paths)
+        try:
+            if self.workers > 1 and len(file_paths) > 1:
+                failed = self._process_files_parallel(file_paths, log_callback)
+            else:
+                failed = self._process_files_sequential(file_paths, log_callback)
+        finally:
+            self.write_report(log_callback)
 
-        for idx, file_name in enumerate(files, 1):
-            file_path = os.path.join(input_folder, file_name)
+        if log_callback:
+            if failed:
+                failed_names = ", ".join(os.path.basename(file_path) for file_path in failed)
+                log_callback(f"Batch processing completed with {len(failed)} failed file(s): {failed_names}")
+            else:
+                log_callback("Batch processing completed.")
+        return failed
+
+    def _process_files_sequential(self, file_paths, log_callback):
+        total_files = len(file_paths)
+        failed = []
+
+        for idx, file_path in enumerate(file_paths, 1):
+            self.cancel_token.raise_if_cancelled()
+            file_name = os.path.basename(file_path)
+            formats = self.pending_formats(file_path, log_callback)
+            if not formats:
+                self._report_file_progress(file_path, 100)
+                continue
             if log_callback:
                 log_callback(f"Processing file: {file_name} ({idx}/{total_files})")
-            converter = ExcelConverter(self.output_folder, log_callback, lambda p: self.progress_callback(int(((idx - 1 + p/100) / total_files) * 100)))
-            converter.load_excel_file(file_path)
-            converter.clean_dataframes(file_path)
-            converter.convert_to_geojson(self.output_folder)
-            converter.convert_to_shapefile(self.output_folder)
+            converter = _excel_converter(self.output_folder, log_callback, cancel_token=self.cancel_token, metrics=self._metrics(), **self.converter_options)
+            self._track_file_progress(converter, file_path)
+            try:
+                self.record(file_path, self.convert_file(converter, file_path, formats))
+                self.add_to_report(file_path, converter.metrics.records, "ok")
+            except ConversionCancelled:
+                self.add_to_report(file_path, converter.metrics.records, "cancelled")
+                raise
+            except Exception as e:
+                self.add_to_report(file_path, converter.metrics.records, "failed")
+                failed.append(file_path)
+                if log_callback:
+                    log_callback(f"❌ Error processing {file_name}: {e}")
+            # A failed file is done too
+            self._report_file_progress(file_path, 100)
+
+        return failed
+
+    def _process_files_parallel(self, file_paths, log_callback):
+        """
+        Spreads files across a process pool and relays their log and progress events from this thread.
+        """
+        failed = []
+        jobs = {}
+        for file_path in file_paths:
+            formats = self.pending_formats(file_path, log_callback)
+            if formats:
+                jobs[file_path] = formats
+            else:
+                self._report_file_progress(file_path, 100)
+        if not jobs:
+            return failed
 
+        def log_event(task, message):
+            if log_callback:
+                log_callback(f"[{os.path.basename(task.file_path)}] {message}")
+
+        workers = min(self.workers, len(jobs))
         if log_callback:
-            log_callback("Batch processing completed.")
+            log_callback(f"Processing {len(jobs)} files with {workers} workers")
+
+        finished = 0
+        with ConversionPool(workers, log_callback=log_event,
+                            progress_callback=lambda task, percent, stage: self._report_file_progress(task.file_path, percent, stage)) as pool:
+            for file_path, formats in jobs.items():
+                pool.submit(file_path, self.output_folder, formats, self.profile, self.converter_options)
+            while pool.active:
+                if self.cancel_token.cancelled:
+                    pool.cancel()
+                for task in pool.poll(timeout=0.1):
+                    finished += 1
+                    file_name = os.path.basename(task.file_path)
+                    self._report_file_progress(task.file_path, 100)
+                    if task.started:
+                        self.add_to_report(task.file_path, task.records, "failed" if task.status == "crashed" else task.status)
+                    if task.status == "ok":
+                        self.record(task.file_path, task.outputs)
+                        if log_callback:
+                            log_callback(f"Finished processing {file_name} ({finished}/{len(jobs)})")
+                    elif task.status in ("failed", "crashed"):
+                        failed.append(task.file_path)
+                        if log_callback:
+                            log_callback(f"❌ Error processing {file_name}: {task.error}")
 
+        self.cancel_token.raise_if_cancelled()
+        return failed
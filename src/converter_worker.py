@@ -1,150 +1,641 @@
+import gc
 import os
+import contextlib
 import pandas as pd
 import geopandas as gpd
 import numpy as np
-import openpyxl
-from openpyxl_image_loader import SheetImageLoader
-import json
+from src.workbook_reader import WorkbookReader, FIRST_DATA_ROW
+from src.image_store import ImageStore
+from src.image_derivatives import ImageDerivatives
+from src.geojson_writer import GeoJSONWriter
+from src.cancellation import raise_if_cancelled
+from src.instrumentation import StageMetrics, ProgressTracker, STAGE_WEIGHTS, STREAMING_STAGE_WEIGHTS, current_rss_mb
+from src.geometry import coordinate_columns, build_geometry, reproject, START
+from src.road_snapping import load_road_network, DEFAULT_TOLERANCE_M, SNAP_ROAD
+from src.dtypes import compact_dtypes, frame_memory_mb
+from src.vector_io import ChunkSchema, VectorChunkWriter, GeoParquetChunkWriter, gdal_config, output_size, remove_output, write_vector
+from src.schema_registry import SCHEMA_REGISTRY
+from src.sheet_cache import SheetCache, CachedWorkbook
+from src.formats import OUTPUT_FORMATS, DEFAULT_FORMATS, CONVERTER_VERSION
+
+LONGITUDE_COLUMN = "TITIK KORDINAT_Longitude"
+LATITUDE_COLUMN = "TITIK KORDINAT_Latitude"
+VALID_POINT_COLUMN = "KOORDINAT_VALID"
+MIN_CHUNK_ROWS = 500
 
 class ExcelConverter:
-    def __init__(self, output_folder, log_callback = None, progress_callback = None) -> None:
+    def __init__(self, output_folder, log_callback = None, progress_callback = None, image_mode = "raw", invalid_points = "flag", cancel_token = None, metrics = None,
+                 streaming = False, chunk_rows = 10000, memory_limit_mb = None, sheet_cache_mb = None, roads = None, snap_tolerance = DEFAULT_TOLERANCE_M,
+                 bbox = None, target_crs = None, derivatives = None, relative_image_paths = False) -> None:
         self.output_folder = output_folder
+        self.cancel_token = cancel_token
+        self.image_mode = image_mode  # "raw" copies the embedded bytes, "decode" re-encodes through PIL
+        self.invalid_points = invalid_points  # "flag" keeps rows with a null geometry and KOORDINAT_VALID, "drop" removes them
         self.log_callback = log_callback
         self.progress_callback = progress_callback
+        self.streaming = streaming  # convert_streaming(): hold one chunk of rows at a time instead of whole workbooks
+        self.chunk_rows = chunk_rows
+        self.memory_limit_mb = memory_limit_mb  # streaming halves chunk_rows while the process is above it
+        self.sheet_cache_mb = sheet_cache_mb  # size of the parsed-sheet cache under sheet_cache; None disables it
+        self.roads = roads  # road layer the geometries are snapped to (road name, kabupaten, chainage); None skips it
+        self.snap_tolerance = snap_tolerance  # metres
+        self.bbox = bbox  # (min lon, min lat, max lon, max lat); points outside are rejected
+        self.target_crs = target_crs  # CRS the geometries are reprojected to; None keeps EPSG:4326
+        self.derivatives = derivatives  # DerivativeSpecs of the downscaled images added as DOK_<NAME> columns
+        self.relative_image_paths = relative_image_paths  # DOKUMENTASI and DOK_<NAME> relative to output_folder, for outputs moved with their images
+        self.progress = ProgressTracker(progress_callback, STREAMING_STAGE_WEIGHTS if streaming else STAGE_WEIGHTS)
+        self.metrics = metrics or StageMetrics()
         self.list_df = {}
-
-    def _update_progress(self, percent):
-        if self.progress_callback:
-            self.progress_callback(percent)
+        self.layouts = {}  # sheet -> CompiledLayout of its header
+        self.list_gdf = None
+        self.rejected = {}  # sheet -> DataFrames of rows whose coordinates could not make a geometry
+        self.repairs = {}  # sheet -> {"parsed": rows, "swapped": rows} of coordinates repaired
+        self.file_path = None
+        self.outputs = {}  # output format (or "images") -> paths written for the current file
+        self._written_paths = []
+        self._write_steps = None  # [tables written, tables to write] across all formats of convert()
+        self.workbook = None
+        self.image_store = None
+        self.image_derivatives = None
+        self.sheet_cache = None
+        self._cache_key = None
 
     def _log(self, message):
         if self.log_callback:
             self.log_callback(message)
 
+    def open_workbook(self, file_path):
+        """
+        Returns the workbook session for the file, opening it once and reusing it for every sheet.
+        """
+        if self.workbook is not None and self.workbook.file_path != file_path:
+            self.close()
+        if self.workbook is None:
+            self.workbook = WorkbookReader(file_path, self.cancel_token,
+                                           lambda fraction: self.progress.update("load", fraction, 1)).open()
+        return self.workbook
+
+    def open_image_store(self):
+        """
+        Returns the shared, content-addressed store under extracted_images.
+        """
+        if self.image_store is None:
+            self.image_store = ImageStore(os.path.join(self.output_folder, "extracted_images"))
+        return self.image_store
+
+    def open_image_derivatives(self):
+        """
+        Returns the derivative maker writing under extracted_images/derivatives.
+        """
+        if self.image_derivatives is None:
+            self.image_derivatives = ImageDerivatives(os.path.join(self.output_folder, "extracted_images", "derivatives"),
+                                                      self.derivatives, cancel_token=self.cancel_token)
+        return self.image_derivatives
+
+    def open_sheet_cache(self):
+        """
+        Returns the parsed-sheet cache under sheet_cache, or None when it is disabled.
+        """
+        if self.sheet_cache is None and self.sheet_cache_mb:
+            self.sheet_cache = SheetCache(os.path.join(self.output_folder, "sheet_cache"), CONVERTER_VERSION, SCHEMA_REGISTRY,
+                                          self.sheet_cache_mb, self.image_mode)
+        if self.sheet_cache is None or not self.sheet_cache.enabled:
+            return None
+        return self.sheet_cache
+
+    def load_cached(self, file_path):
+        """
+        Loads the cleaned sheets of file_path from the sheet cache instead of the workbook.
+        Returns False when the cache is disabled or holds no entry for this content.
+        """
+        cache = self.open_sheet_cache()
+        if cache is None:
+            return False
+        self.file_path = file_path
+        self.metrics.file = os.path.basename(file_path)
+        with self.metrics.stage("cache") as record:
+            self._cache_key = cache.key(file_path)
+            cached = cache.get(self._cache_key)
+            if cached is not None:
+                record.update(rows=sum(len(df) for df in cached.sheets.values()), images=len(cached.images))
+        if cached is None:
+            return False
+
+        self.list_df = cached.sheets
+        self.layouts = cached.layouts
+        if cached.images:
+            self.outputs["images"] = list(cached.images)
+        self.progress.update("load", 1, 1)
+        self.progress.update("images", 1, 1)
+        self._log(f"♻️ Reusing the cached sheets of {os.path.basename(file_path)}")
+        return True
+
+    def cache_sheets(self):
+        """
+        Stores the cleaned sheets of the current file in the sheet cache, when it is enabled.
+        """
+        cache = self.open_sheet_cache()
+        if cache is None:
+            return
+        with self.metrics.stage("cache"):
+            key = self._cache_key or cache.key(self.file_path)
+            stored = cache.put(key, CachedWorkbook(self.list_df, self.layouts, self.outputs.get("images", [])))
+        if not stored:
+            self._log(f"⚠️ Warning: Could not cache the sheets of {os.path.basename(self.file_path)}.")
+
+    def close(self):
+        """
+        Closes the workbook session of the current file and saves the image index.
+        """
+        if self.workbook is not None:
+            self.workbook.close()
+            self.workbook = None
+        if self.image_store is not None:
+            self.image_store.flush()
+
     def load_excel_file(self, file_path):
         """
         Loads the Excel file and extracts each sheet into each DataFrames.
         """
-        self._update_progress(20)
-        xl = pd.ExcelFile(file_path)
-
-        for sheet in xl.sheet_names:
-            df_temp = xl.parse(sheet, header=None)
-            table_name = df_temp.iloc[0].dropna().values[0]
+        self.file_path = file_path
+        self.metrics.file = os.path.basename(file_path)
+        workbook = self.open_workbook(file_path)
 
-            df = xl.parse(sheet, header=[2, 3, 4])
-            df.columns = ["_".join([str(c) for c in col if "Unnamed" not in str(c)]).strip() for col in df.columns.values]
-            df = df.loc[:, ~df.columns.str.contains("Rekap", case=False, na=False)]
+        for sheet_data, record in self.metrics.iterate("load", workbook.read_sheets()):
+            df = sheet_data.df
+            record.update(sheet=sheet_data.name, rows=len(df), images=len(sheet_data.images), layout=sheet_data.layout.name)
+            if not self._known_layout(sheet_data.name, sheet_data.layout):
+                continue
+            df["DETAIL LOKASI"] = df["DETAIL LOKASI"].fillna(sheet_data.title)
 
-            df["DETAIL LOKASI"] = df["DETAIL LOKASI"].fillna(table_name)
+            self.list_df[sheet_data.name] = df
+            self.layouts[sheet_data.name] = sheet_data.layout
 
-            self.list_df[sheet] = df
+    def _known_layout(self, sheet, layout):
+        if not layout.known:
+            self._log(f"⚠️ Warning: Sheet {sheet} has an unknown layout ({layout.describe()}), it is not converted.")
+        return layout.known
 
     def clean_dataframes(self, file_path):
         """
         Cleans and preprocessed the DataFrames.
         """
-        for sheet, df in self.list_df.items():
-            # from this on df below didn't recognized as dataframes, why?
-            binary_columns = [col for col in df.columns if col.startswith(("JENIS RAMBU", "LOKASI PEMASANGAN"))]
+        sheet_count = len(self.list_df)
+        for sheet_index, (sheet, df) in enumerate(self.list_df.items()):
+            raise_if_cancelled(self.cancel_token)
+            self.list_df[sheet] = self._clean_dataframe(file_path, df, sheet, (sheet_index, sheet_count))
+
+        self.progress.update("images", 1, 1)
+
+    def _clean_dataframe(self, file_path, df, sheet, sheet_position = (0, 1), chunk = False):
+        with self.metrics.stage("clean", sheet) as record:
+            binary_columns = self.layouts[sheet].binary_columns
             df[binary_columns] = df[binary_columns].fillna("No").replace({1.0: "Yes"})
 
             if "DOKUMENTASI" not in df.columns:
                 df["DOKUMENTASI"] = ""
             df["DOKUMENTASI"] = df["DOKUMENTASI"].astype(str)
 
-            self.extract_images(file_path, df, sheet)
+            self.extract_images(file_path, df, sheet, sheet_position, chunk)
 
             # Drop completely empty columns (after extracting images)
-            self.list_df[sheet] = df.dropna(how="all", subset=df.columns[1:])
+            df = df.dropna(how="all", subset=df.columns[1:])
+            record["rows"] = len(df)
+        return df
 
-        self._update_progress(40)
-
-    def extract_images(self, file_path, df, sheet_name):
+    def extract_images(self, file_path, df, sheet_name, sheet_position = (0, 1), chunk = False):
         """
         Extracts images from the Excel file and updates the DataFrame.
+
+        With chunk=True only the images anchored on the rows of df (one chunk of the sheet) are extracted.
         """
-        pxl_doc = openpyxl.load_workbook(file_path, data_only=True)
-        sheet = pxl_doc[sheet_name]  
-        image_loader = SheetImageLoader(sheet)  
+        with self.metrics.stage("images", sheet_name) as record:
+            self._extract_images(file_path, df, sheet_name, sheet_position, chunk, record)
 
-        output_folder = os.path.join(self.output_folder, "extracted_images")
-        os.makedirs(output_folder, exist_ok=True)
+    def _extract_images(self, file_path, df, sheet_name, sheet_position, chunk, record):
+        image_index = self.open_workbook(file_path).image_index(sheet_name)
+
+        image_store = self.open_image_store()
+        bytes_before = image_store.bytes_written
+        sheet_index, sheet_count = sheet_position
 
         dokumentasi_column = "C"  # Replace with actual column letter
-        for row in range(6, sheet.max_row + 1):
+        if chunk:
+            rows = image_index.rows_in(dokumentasi_column, FIRST_DATA_ROW + df.index[0], FIRST_DATA_ROW + df.index[-1]) if len(df) else []
+        else:
+            rows = image_index.rows_in(dokumentasi_column)
+        for done, row in enumerate(rows):
+            raise_if_cancelled(self.cancel_token)
+            self.progress.update("images", sheet_index + done / len(rows), sheet_count)
             cell_address = f"{dokumentasi_column}{row}"
-            image_name = f"{sheet_name}_{row}.jpg"
-            image_path = os.path.join(output_folder, image_name)
+            zip_image = image_index.get(dokumentasi_column, row)
+
+            try:
+                if self.image_mode == "raw" and not zip_image.needs_transcode:
+                    image_path = image_store.store_raw(zip_image)
+                else:
+                    image_path = image_store.store_jpeg(zip_image)
+
+                # Store the shared image path in the DataFrame
+                self.outputs.setdefault("images", []).append(image_path)
+                df.loc[row - FIRST_DATA_ROW, "DOKUMENTASI"] = image_path
+            except Exception as e:
+                self._log(f"⚠️ Warning: Could not process image at {cell_address} in sheet {sheet_name}. Error: {e}")
+                df.loc[row - FIRST_DATA_ROW, "DOKUMENTASI"] = "Image extraction failed"
 
-            # ✅ Skip if image already exists
-            if os.path.exists(image_path):
-                self.list_df[sheet_name].loc[row - 6, "DOKUMENTASI"] = image_path
+        record.update(images=len(rows), bytes_written=image_store.bytes_written - bytes_before)
+    
+    def build_geodataframes(self):
+        """
+        Builds one typed GeoDataFrame per sheet that every output writer reads from.
+        """
+        self.list_gdf = {}
+        for table_index, (table_name, df) in enumerate(self.list_df.items()):
+            raise_if_cancelled(self.cancel_token)
+            self.progress.update("build", table_index, len(self.list_df))
+            layout = self.layouts[table_name]
+            if not layout.coordinate_columns:
+                self._log(f"⚠️ Warning: Sheet {table_name} has no coordinate columns (TITIK KORDINAT or start/end), it is not written.")
                 continue
+            with self.metrics.stage("build", table_name) as record:
+                self.list_gdf[table_name], rejected = self._build_geodataframe(df, layout, table_name)
+                self.rejected[table_name] = [rejected]
+                record["rows"] = len(self.list_gdf[table_name])
+            self._log_invalid_points(table_name, len(rejected))
+            self._log_repairs(table_name)
 
-            if image_loader.image_in(cell_address):
-                try:
-                    image = image_loader.get(cell_address)
+        self.progress.update("build", 1, 1)
+        return self.list_gdf
 
-                    # Ensure it's a valid image
-                    if image:
-                        image = image.convert("RGB")
-                        image.save(image_path)
+    def _log_invalid_points(self, table_name, invalid_count):
+        if invalid_count:
+            self._log(f"⚠️ Warning: {invalid_count} row(s) in sheet {table_name} have missing or invalid coordinates ({self.invalid_points}), see rejected_records.")
 
-                        # Store the image path in the DataFrame
-                        self.list_df[sheet_name].loc[row - 6, "DOKUMENTASI"] = image_path  
-                except Exception as e:
-                    self._log(f"⚠️ Warning: Could not process image at {cell_address} in sheet {sheet_name}. Error: {e}")
-                    self.list_df[sheet_name].loc[row - 6, "DOKUMENTASI"] = "Image extraction failed"
+    def _log_repairs(self, table_name):
+        repairs = self.repairs.get(table_name, {})
+        if any(repairs.values()):
+            self._log(f"⚠️ Warning: Repaired the coordinates of sheet {table_name}: {repairs['parsed']} row(s) read from text "
+                      f"(comma decimals, degrees/minutes/seconds), {repairs['swapped']} row(s) with latitude and longitude swapped.")
 
-        # Close the workbook **after** all processing is done
-        pxl_doc.close()
-        self._update_progress(60)
-    
-    def convert_to_geojson(self, output_path):
-        """
-        Converts each cleaned DataFrame to a GeoJSON format.
-        """
-        for table_name, df in self.list_df.items():
-            features = []
-            for _, row in df.iterrows():
-                properties = row.drop(["TITIK KORDINAT_Latitude", "TITIK KORDINAT_Longitude"], errors="ignore").to_dict()
-                feature = {
-                    "type": "Feature",
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": [row["TITIK KORDINAT_Longitude"], row["TITIK KORDINAT_Latitude"]]
-                    },
-                    "properties": properties
-                }
-                features.append(feature)
-
-            geojson_data = {"type": "FeatureCollection", "features": features}
+    def _build_geodataframe(self, df, layout, table_name = None, chunk = False):
+        """
+        Typed GeoDataFrame of one sheet (or chunk) with Point or LineString geometries, invalid rows flagged
+        or dropped, and the rejected rows with their Excel row number and reason.
+        """
+        if self.derivatives:
+            df = self._add_image_derivatives(df, table_name)
+        if self.relative_image_paths:
+            df = self._relative_image_paths(df)
+        with self.metrics.stage("coordinates", table_name) as record:
+            geometry, valid, reasons, numeric, repairs = build_geometry(df, layout.coordinate_columns, self.bbox)
+            record["rows"] = int(valid.sum())
+        totals = self.repairs.setdefault(table_name, dict.fromkeys(repairs, 0))
+        for repair, count in repairs.items():
+            totals[repair] += count
+        rejected = df[~valid].copy()
+        rejected.insert(0, "REJECT_REASON", reasons[~valid])
+        rejected.insert(0, "EXCEL_ROW", rejected.index + FIRST_DATA_ROW)
+
+        with self.metrics.stage("optimize", table_name) as record:
+            memory_before = frame_memory_mb(df)
+            # Types that depend on the rows read would not match the schema fixed by a stream's first chunk
+            data = compact_dtypes(df.assign(**numeric), layout.binary_columns, list(numeric), categorize=not chunk, downcast=not chunk)
+            memory_after = frame_memory_mb(data)
+            record.update(rows=len(data), memory_before_mb=memory_before, memory_after_mb=memory_after,
+                          memory_saved_mb=round(memory_before - memory_after, 3))
+
+        if self.invalid_points == "drop":
+            data, geometry = data[valid], geometry[valid]
+        elif self.invalid_points == "flag":
+            data[VALID_POINT_COLUMN] = valid
+
+        crs = "EPSG:4326"
+        if self.target_crs:
+            with self.metrics.stage("reproject", table_name) as record:
+                geometry, crs = reproject(geometry, self.target_crs), self.target_crs
+                record["rows"] = len(geometry)
+        gdf = gpd.GeoDataFrame(data, geometry=geometry, crs=crs)
+        if self.roads:
+            self._snap_to_roads(gdf, layout, table_name, chunk)
+        return gdf, rejected
+
+    def _add_image_derivatives(self, df, table_name):
+        """
+        Makes the missing derivatives of the images of df and returns df with their paths in DOK_<NAME> columns.
+        """
+        derivatives = self.open_image_derivatives()
+        with self.metrics.stage("derivatives", table_name) as record:
+            sources = df["DOKUMENTASI"]
+            # Empty cells and failed extractions have no image to downscale
+            stored = [path for path in pd.unique(sources.dropna()) if os.path.isfile(path)]
+            made, failed = derivatives.made, len(derivatives.failed)
+            paths = derivatives.generate(stored)
+            columns = {spec.column: sources.map(paths[spec.name]) for spec in derivatives.specs}
+            record.update(rows=len(stored), images=derivatives.made - made)
+
+        for spec_paths in paths.values():
+            self.outputs.setdefault("images", []).extend(spec_paths.values())
+        if len(derivatives.failed) > failed:
+            self._log(f"⚠️ Warning: Could not downscale {len(derivatives.failed) - failed} image(s) of sheet {table_name}.")
+        return df.assign(**columns)
+
+    def _relative_image_paths(self, df):
+        """
+        df with the stored image paths of DOKUMENTASI and the DOK_<NAME> columns made relative to the output folder.
+        """
+        root = os.path.abspath(self.output_folder)
+        columns = {}
+        for column in df.columns:
+            if column != "DOKUMENTASI" and not column.startswith("DOK_"):
+                continue
+            # Empty cells and "Image extraction failed" are kept as they are
+            paths = {value: os.path.relpath(value, root) for value in pd.unique(df[column].dropna())
+                     if isinstance(value, str) and os.path.isfile(value)}
+            columns[column] = df[column].map(lambda value: paths.get(value, value))
+        return df.assign(**columns)
+
+    def _snap_to_roads(self, gdf, layout, table_name, chunk = False):
+        """
+        Adds the road name, kabupaten, chainage and snapping distance of the nearest road to every row of gdf.
+        """
+        network = load_road_network(self.roads)
+        with self.metrics.stage("snap", table_name) as record:
+            snapped = network.snap(gdf, self.snap_tolerance, lines=START in layout.coordinate_columns)
+            gdf[list(snapped.columns)] = snapped
+            record["rows"] = int(snapped[SNAP_ROAD].notna().sum())
+        unmatched = int(gdf.geometry.notna().sum()) - record["rows"]
+        if unmatched and not chunk:
+            self._log(f"⚠️ Warning: {unmatched} row(s) in sheet {table_name} are more than {self.snap_tolerance:g} m from any road, no road is attached.")
+
+    def write_rejected_records(self, output_path):
+        """
+        Writes the rejected rows of every sheet to rejected_records/<workbook>.xlsx, one worksheet per sheet.
+        """
+        workbook_name = os.path.splitext(os.path.basename(self.file_path))[0]
+        rejected_path = os.path.join(output_path, "rejected_records", f"{workbook_name}.xlsx")
+        rejected = {sheet: pd.concat(frames) for sheet, frames in self.rejected.items() if any(len(frame) for frame in frames)}
+        if not rejected:
+            # A clean run must not leave the rejections of an earlier one behind
+            if os.path.exists(rejected_path):
+                os.remove(rejected_path)
+            return
+
+        os.makedirs(os.path.dirname(rejected_path), exist_ok=True)
+        with pd.ExcelWriter(rejected_path, engine="openpyxl") as writer:
+            for sheet, df in rejected.items():
+                df.to_excel(writer, sheet_name=sheet[:31], index=False)
+        self.outputs["rejected"] = [rejected_path]
+
+    def convert_to_geojson(self, output_path, compact = True, backend = "auto"):
+        """
+        Converts each GeoDataFrame to a GeoJSON format.
+        """
+        writer = GeoJSONWriter(compact=compact, backend=backend)
+        for table_name, gdf in self.list_gdf.items():
+            raise_if_cancelled(self.cancel_token)
             file_name = f"{table_name}.geojson"
             geojson_path = os.path.join(output_path, file_name)
+            with self.metrics.stage("geojson", table_name) as record:
+                writer.write(gdf, geojson_path, drop_columns=self._geojson_drop_columns(gdf), cancel_token=self.cancel_token, crs=self.target_crs)
+                self._table_written(record, gdf, geojson_path)
+            self._written_paths.append(geojson_path)
 
-            with open(geojson_path, "w", encoding="utf-8") as f:
-                json.dump(geojson_data, f, ensure_ascii=False, indent=4)
-
-        self._update_progress(80)
+    @staticmethod
+    def _geojson_drop_columns(gdf):
+        """
+        The coordinate columns a geometry was built from; GeoJSON carries them in the geometry already.
+        """
+        return [column for pair in coordinate_columns(gdf.columns).values() for column in pair]
 
     def convert_to_shapefile(self, output_path):
         """
-        Converts DataFrames to Shapefile format using GeoPandas.
+        Converts GeoDataFrames to Shapefile format using GeoPandas.
+        """
+        for table_name, gdf in self.list_gdf.items():
+            raise_if_cancelled(self.cancel_token)
+            shapefile_path = self._shapefile_path(output_path, table_name)
+            with self.metrics.stage("shapefile", table_name) as record:
+                write_vector(gdf, shapefile_path, "ESRI Shapefile")
+                self._table_written(record, gdf, shapefile_path)
+            self._written_paths.append(shapefile_path)
+
+    @staticmethod
+    def _shapefile_path(output_path, table_name):
+        shapefile_folder = os.path.join(output_path, f"{table_name}_shapefile", table_name)
+        os.makedirs(shapefile_folder, exist_ok=True)
+        return os.path.join(shapefile_folder, f"{table_name}.shp")
+
+    def _start_geopackage(self, output_path):
+        """
+        Removes the workbook's previous GeoPackage and returns its path.
         """
-        for table_name, df in self.list_df.items():
-            if "TITIK KORDINAT_Latitude" in df.columns and "TITIK KORDINAT_Longitude" in df.columns:
-                gdf = gpd.GeoDataFrame(
-                    df,
-                    geometry=gpd.points_from_xy(df["TITIK KORDINAT_Longitude"], df["TITIK KORDINAT_Latitude"]),
-                    crs="EPSG:4326"
-                )
+        workbook_name = os.path.splitext(os.path.basename(self.file_path))[0]
+        geopackage_path = os.path.join(output_path, f"{workbook_name}.gpkg")
+        if os.path.exists(geopackage_path):
+            os.remove(geopackage_path)
+        return geopackage_path
 
-                shapefile_folder = os.path.join(output_path, f"{table_name}_shapefile")
-                os.makedirs(shapefile_folder, exist_ok=True)
-                shapefile_path = os.path.join(shapefile_folder, table_name)
+    @staticmethod
+    def _geopackage_writes():
+        """
+        Context for the writes of a GeoPackage: it is rebuilt from scratch on every run, so an fsync per
+        appended layer buys nothing. The setting is restored afterwards.
+        """
+        return gdal_config(OGR_SQLITE_SYNCHRONOUS="OFF")
 
-                gdf.to_file(shapefile_path, driver="ESRI Shapefile")
+    def convert_to_geopackage(self, output_path):
+        """
+        Writes all sheets of the workbook as layers of one GeoPackage.
+        """
+        geopackage_path = self._start_geopackage(output_path)
+        with self._geopackage_writes():
+            for table_name, gdf in self.list_gdf.items():
+                raise_if_cancelled(self.cancel_token)
+                size_before = output_size(geopackage_path)
+                with self.metrics.stage("gpkg", table_name) as record:
+                    write_vector(gdf, geopackage_path, "GPKG", layer=table_name)
+                    self._table_written(record, gdf, geopackage_path)
+                    record["bytes_written"] -= size_before
+                if geopackage_path not in self._written_paths:
+                    self._written_paths.append(geopackage_path)
 
-        self._update_progress(80)
+    def convert_to_flatgeobuf(self, output_path):
+        """
+        Converts each GeoDataFrame to a FlatGeobuf file.
+        """
+        for table_name, gdf in self.list_gdf.items():
+            raise_if_cancelled(self.cancel_token)
+            fgb_path = os.path.join(output_path, f"{table_name}.fgb")
+            with self.metrics.stage("fgb", table_name) as record:
+                write_vector(gdf, fgb_path, "FlatGeobuf")
+                self._table_written(record, gdf, fgb_path)
+            self._written_paths.append(fgb_path)
+
+    def convert_to_geoparquet(self, output_path):
+        """
+        Converts each GeoDataFrame to a GeoParquet file (needs pyarrow).
+        """
+        for table_name, gdf in self.list_gdf.items():
+            raise_if_cancelled(self.cancel_token)
+            parquet_path = os.path.join(output_path, f"{table_name}.parquet")
+            with self.metrics.stage("parquet", table_name) as record:
+                gdf.to_parquet(parquet_path)
+                self._table_written(record, gdf, parquet_path)
+            self._written_paths.append(parquet_path)
+
+    def _table_written(self, record, gdf, path):
+        """
+        Fills the stage record of one written table and advances the write progress.
+        """
+        record.update(rows=len(gdf), bytes_written=output_size(path))
+        done, total = self._write_steps or (0, len(self.list_gdf))
+        self._write_steps = [done + 1, total]
+        self.progress.update("write", done + 1, total)
+
+    def convert(self, output_path, formats = DEFAULT_FORMATS):
+        """
+        Writes the GeoDataFrames in each of the requested output formats.
+        """
+        if self.list_gdf is None:
+            self.build_geodataframes()
+
+        self._write_steps = [0, len(formats) * len(self.list_gdf)]
+        for output_format in formats:
+            if output_format not in OUTPUT_FORMATS:
+                raise ValueError(f"Unknown output format '{output_format}'. Choose from: {', '.join(OUTPUT_FORMATS)}")
+            self._written_paths = []
+            try:
+                getattr(self, OUTPUT_FORMATS[output_format])(output_path)
+            except BaseException:
+                # Cancelled or failed, a half-written output must not pass for a complete one
+                self._remove_partial_outputs()
+                raise
+            self.outputs[output_format] = self._written_paths
+        self.progress.emit(100)
+
+    def _remove_partial_outputs(self):
+        """
+        Deletes what a cancelled or failed writer had already written for the current format.
+        """
+        for path in self._written_paths:
+            remove_output(path)
+        self._written_paths = []
+
+    def convert_streaming(self, file_path, output_path, formats = DEFAULT_FORMATS):
+        """
+        Converts a file sheet by sheet and chunk by chunk, holding at most chunk_rows rows of it in memory.
+
+        Every chunk goes through cleaning, image extraction and the geometry build, and is then appended
+        to the outputs of its sheet. A cancelled or failed conversion removes everything it wrote for the file.
+        """
+        for output_format in formats:
+            if output_format not in OUTPUT_FORMATS:
+                raise ValueError(f"Unknown output format '{output_format}'. Choose from: {', '.join(OUTPUT_FORMATS)}")
+        self.file_path = file_path
+        self.metrics.file = os.path.basename(file_path)
+        self._written_paths = []
+        for output_format in formats:
+            self.outputs[output_format] = []
+
+        workbook = self.open_workbook(file_path)
+        geopackage_path = self._start_geopackage(output_path) if "gpkg" in formats else None
+        try:
+            with self._geopackage_writes() if geopackage_path else contextlib.nullcontext():
+                for sheet_stream in workbook.stream_sheets(self.chunk_rows):
+                    self._stream_sheet(file_path, sheet_stream, output_path, formats, geopackage_path)
+        except BaseException:
+            self._remove_partial_outputs()
+            raise
+        self.progress.emit(100)
+
+    def _open_chunk_writer(self, output_format, output_path, table_name, geopackage_path, columns):
+        """
+        Returns (path, writer) for one sheet in one format; the paths match those of the convert_to_* writers.
+        """
+        if output_format == "geojson":
+            path = os.path.join(output_path, f"{table_name}.geojson")
+            return path, GeoJSONWriter().open(path, drop_columns=[column for pair in columns.values() for column in pair], cancel_token=self.cancel_token,
+                                              crs=self.target_crs)
+        if output_format == "shapefile":
+            path = self._shapefile_path(output_path, table_name)
+            return path, VectorChunkWriter(path, "ESRI Shapefile")
+        if output_format == "gpkg":
+            return geopackage_path, VectorChunkWriter(geopackage_path, "GPKG", layer=table_name)
+        if output_format == "fgb":
+            path = os.path.join(output_path, f"{table_name}.fgb")
+            # GDAL rebuilds the spatial index of a FlatGeobuf on every append, so it is left out
+            return path, VectorChunkWriter(path, "FlatGeobuf", layer_options={"SPATIAL_INDEX": "NO"})
+        path = os.path.join(output_path, f"{table_name}.parquet")
+        return path, GeoParquetChunkWriter(path)
+
+    def _stream_sheet(self, file_path, sheet_stream, output_path, formats, geopackage_path):
+        table_name = sheet_stream.name
+        layout = sheet_stream.layout
+        if not self._known_layout(table_name, layout):
+            return
+        self.layouts[table_name] = layout
+        columns = layout.coordinate_columns
+        if not columns:
+            self._log(f"⚠️ Warning: Sheet {table_name} has no coordinate columns (TITIK KORDINAT or start/end), it is not written.")
+            return
+
+        writers = {}
+        schema = None
+        lost_count = 0
+        self.rejected[table_name] = []
+        try:
+            for df, record in self.metrics.iterate("load", sheet_stream.chunks):
+                record.update(sheet=table_name, rows=len(df))
+                df["DETAIL LOKASI"] = df["DETAIL LOKASI"].fillna(sheet_stream.title)
+                df = self._clean_dataframe(file_path, df, table_name, chunk=True)
+
+                with self.metrics.stage("build", table_name) as record:
+                    gdf, rejected = self._build_geodataframe(df, layout, table_name, chunk=True)
+                    del df
+                    schema = schema or ChunkSchema(gdf)
+                    lost_count += schema.conform(gdf)
+                    self.rejected[table_name].append(rejected)
+                    record["rows"] = len(gdf)
+
+                for output_format in formats:
+                    raise_if_cancelled(self.cancel_token)
+                    if output_format not in writers:
+                        path, writers[output_format] = self._open_chunk_writer(output_format, output_path, table_name, geopackage_path, columns)
+                        if path not in self._written_paths:
+                            self._written_paths.append(path)
+                        if path not in self.outputs[output_format]:
+                            self.outputs[output_format].append(path)
+                    with self.metrics.stage(output_format, table_name) as record:
+                        writers[output_format].append(gdf)
+                        record["rows"] = len(gdf)
+                del gdf
+                self._check_memory(sheet_stream)
+
+            for writer in writers.values():
+                writer.close()
+        except BaseException:
+            for writer in writers.values():
+                writer.abort()
+            raise
+
+        self._log_invalid_points(table_name, sum(len(rejected) for rejected in self.rejected[table_name]))
+        self._log_repairs(table_name)
+        if lost_count:
+            self._log(f"⚠️ Warning: {lost_count} value(s) in sheet {table_name} did not fit the column types set by its first chunk and were dropped.")
+
+    def _check_memory(self, sheet_stream):
+        """
+        Halves the chunk size while the process stays above memory_limit_mb after a collection.
+        """
+        if not self.memory_limit_mb:
+            return
+        rss = current_rss_mb()
+        if rss is None or rss <= self.memory_limit_mb:
+            return
+        gc.collect()
+        rss = current_rss_mb()
+        if rss > self.memory_limit_mb and sheet_stream.chunk_rows > MIN_CHUNK_ROWS:
+            sheet_stream.chunk_rows = max(MIN_CHUNK_ROWS, sheet_stream.chunk_rows // 2)
+            self.chunk_rows = sheet_stream.chunk_rows
+            self._log(f"⚠️ Warning: memory use {rss:.0f} MB is above the {self.memory_limit_mb} MB limit, reading {sheet_stream.chunk_rows} rows at a time.")
 
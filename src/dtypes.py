@@ -0,0 +1,44 @@
+import pandas as pd
+
+YES_NO = pd.CategoricalDtype(["No", "Yes"])
+# A text column becomes categorical when it has at most this many distinct values per row
+CATEGORY_RATIO = 0.5
+MIB = 1024 * 1024
+
+def frame_memory_mb(df):
+    """
+    Memory held by the columns of df in MiB, counting the Python strings of object columns.
+    """
+    return round(df.memory_usage(deep=True, index=False).sum() / MIB, 3)
+
+def compact_dtypes(df, binary_columns = (), float_columns = (), categorize = True, downcast = True):
+    """
+    Returns df with compact column types: Yes/No binary columns as YES_NO categoricals, float_columns
+    as float64, integer columns downcast to the smallest integer type and text columns with repeated
+    values as categoricals. Columns holding anything else keep their type.
+
+    categorize and downcast give types that depend on the rows at hand; chunked writers that fix their
+    schema on the first chunk turn them off.
+    """
+    converted = {}
+    for column in binary_columns:
+        if df[column].isin(YES_NO.categories).all():
+            converted[column] = df[column].astype(YES_NO)
+    for column in float_columns:
+        if df[column].dtype != "float64":
+            converted[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+
+    for column in df.columns:
+        if column in converted or column in binary_columns or column in float_columns:
+            continue
+        series = df[column]
+        if downcast and pd.api.types.is_integer_dtype(series.dtype) and not isinstance(series.dtype, pd.CategoricalDtype):
+            converted[column] = pd.to_numeric(series, downcast="integer")
+        elif categorize and (pd.api.types.is_object_dtype(series.dtype) or pd.api.types.is_string_dtype(series.dtype)):
+            if len(series) > 1 and series.nunique() <= len(series) * CATEGORY_RATIO \
+                    and pd.api.types.infer_dtype(series, skipna=True) == "string":
+                converted[column] = series.astype("category")
+
+    if not converted:
+        return df
+    return df.assign(**converted)
@@ -0,0 +1,244 @@
+import os
+import time
+import queue
+import zipfile
+import threading
+from src.worker_pool import ConversionPool
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+# Events that mean a file's content may have changed; "opened" and "closed_no_write" would also fire
+# every time a worker reads a workbook
+CHANGE_EVENTS = ("created", "modified", "moved", "closed")
+TICK_SECONDS = 0.2
+
+def is_workbook(path):
+    name = os.path.basename(path)
+    # Excel keeps a "~$name.xlsx" lock file next to every open workbook
+    return name.lower().endswith(EXCEL_EXTENSIONS) and not name.startswith("~$")
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def _complete(path):
+    """
+    Whether a file that stopped growing can be read as a workbook: on Windows a file still being copied
+    cannot be opened, and an .xlsx whose zip directory is missing has not been fully written.
+    """
+    try:
+        if path.lower().endswith(".xlsx"):
+            return zipfile.is_zipfile(path)
+        with open(path, "rb"):
+            return True
+    except OSError:
+        return False
+
+class _ChangeHandler(FileSystemEventHandler):
+    def __init__(self, changes) -> None:
+        self.changes = changes
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in CHANGE_EVENTS:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            path = os.fsdecode(path)
+            if path and is_workbook(path):
+                self.changes.put(path)
+
+class FolderWatcher:
+    """
+    Converts the workbooks dropped into a folder as they arrive, until stop() is called.
+
+    Changes are noticed through watchdog (inotify on Linux, the native APIs on Windows and macOS) when it
+    is installed, otherwise, or with poll=True (network shares), by rescanning the folder every poll_interval
+    seconds. A file is converted once its size and mtime have not changed for debounce_seconds; any number
+    of events for the same file collapse into one job, and a file changed while it converts is converted
+    once more afterwards. Jobs run on a pool of processor.workers processes that stays warm between files.
+    A file is remembered as converted once it converted or failed on its own; a file cancelled by stop() or
+    whose worker died is converted again the next time it changes or the watcher starts.
+    """
+    def __init__(self, processor, input_folder, log_callback = None, debounce_seconds = 2.0, poll_interval = 1.0, poll = False) -> None:
+        self.processor = processor
+        self.input_folder = os.path.abspath(input_folder)
+        self.log_callback = log_callback
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        self.poll = poll or Observer is None
+        self.workers = processor.workers
+        self.changes = queue.Queue()
+        self.stopped = threading.Event()
+        self.dirty = {}  # path -> [signature, last change, first seen]
+        self.ready = {}  # stable files waiting for a worker, in arrival order: path -> (signature, first seen)
+        self.running = {}  # task -> (signature, first seen)
+        self.rerun = set()
+        self.converted = {}  # path -> signature of the content last converted
+        self.waiting_logged = set()
+        self.statuses = []  # (path, status, stage metrics) of every file that ran
+        self.pool = ConversionPool(self.workers, log_callback=lambda task, message: self._log(f"[{os.path.basename(task.file_path)}] {message}"))
+        self._observer = None
+        self._thread = None
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def start(self):
+        """
+        Runs the watcher on a background thread, for callers that must stay responsive (the GUI).
+        """
+        self._thread = threading.Thread(target=self.run, name="FolderWatcher", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self.stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def run(self):
+        """
+        Watches the folder and converts files until stop() is called or the processor's token is cancelled.
+        """
+        os.makedirs(self.input_folder, exist_ok=True)
+        self._start_source()
+        self.pool.start()
+        mode = "polling" if self.poll else "file system events"
+        self._log(f"👀 Watching {self.input_folder} ({mode}, {self.workers} worker(s)). Press Ctrl+C to stop.")
+        try:
+            while not self.stopped.is_set() and not self.processor.cancel_token.cancelled:
+                self._collect_changes()
+                self._promote_stable_files()
+                self._submit_ready_files()
+                self._collect_results()
+                self.stopped.wait(TICK_SECONDS)
+        finally:
+            self._shutdown()
+
+    def _start_source(self):
+        # Files already in the folder count as arrivals; incremental processors skip the unchanged ones
+        for entry in os.scandir(self.input_folder):
+            if entry.is_file() and is_workbook(entry.path):
+                self.changes.put(entry.path)
+        if self.poll:
+            threading.Thread(target=self._poll_folder, name="FolderWatcherPoll", daemon=True).start()
+        else:
+            self._observer = Observer()
+            self._observer.schedule(_ChangeHandler(self.changes), self.input_folder, recursive=False)
+            self._observer.start()
+
+    def _poll_folder(self):
+        signatures = {}
+        while not self.stopped.wait(self.poll_interval):
+            current = {}
+            try:
+                with os.scandir(self.input_folder) as entries:
+                    for entry in entries:
+                        if entry.is_file() and is_workbook(entry.path):
+                            stat = entry.stat()
+                            current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                # The share may be briefly unavailable; try again at the next interval
+                continue
+            for path, signature in current.items():
+                if signatures.get(path) != signature:
+                    self.changes.put(path)
+            signatures = current
+
+    def _collect_changes(self):
+        now = time.monotonic()
+        while True:
+            try:
+                path = os.path.abspath(self.changes.get_nowait())
+            except queue.Empty:
+                return
+            signature = _signature(path)
+            if signature is None:
+                self.dirty.pop(path, None)
+                continue
+            entry = self.dirty.get(path)
+            if entry is None:
+                self.dirty[path] = [signature, now, now]
+            elif entry[0] != signature:
+                entry[0], entry[1] = signature, now
+
+    def _promote_stable_files(self):
+        now = time.monotonic()
+        for path, entry in list(self.dirty.items()):
+            signature = _signature(path)
+            if signature is None:
+                del self.dirty[path]
+                continue
+            if signature != entry[0]:
+                # Still being written: restart the quiet period
+                entry[0], entry[1] = signature, now
+                continue
+            if now - entry[1] < self.debounce_seconds:
+                continue
+            if not _complete(path):
+                if path not in self.waiting_logged:
+                    self.waiting_logged.add(path)
+                    self._log(f"⚠️ Warning: {os.path.basename(path)} is not a complete workbook yet, waiting for it.")
+                entry[1] = now
+                continue
+
+            del self.dirty[path]
+            self.waiting_logged.discard(path)
+            if any(task.file_path == path for task in self.running):
+                self.rerun.add(path)
+            elif self.converted.get(path) != signature:
+                self.ready.setdefault(path, (signature, entry[2]))
+
+    def _submit_ready_files(self):
+        while self.ready and len(self.running) < self.workers:
+            path = next(iter(self.ready))
+            signature, arrived = self.ready.pop(path)
+            formats = self.processor.pending_formats(path, self.log_callback)
+            if not formats:
+                self.converted[path] = signature
+                continue
+            self._log(f"Processing file: {os.path.basename(path)}")
+            task = self.pool.submit(path, self.processor.output_folder, formats, self.processor.profile, self.processor.converter_options)
+            self.running[task] = (signature, arrived)
+
+    def _collect_results(self):
+        for task in self.pool.poll():
+            signature, arrived = self.running.pop(task)
+            path = task.file_path
+            file_name = os.path.basename(path)
+            if task.started:
+                self.statuses.append((path, "failed" if task.status == "crashed" else task.status, task.records))
+            if task.status == "ok":
+                self.converted[path] = signature
+                self.processor.record(path, task.outputs)
+                self._log(f"Finished processing {file_name} ({time.monotonic() - arrived:.1f}s after it arrived)")
+            elif task.status == "failed":
+                # The same content would fail again; wait for the file to change
+                self.converted[path] = signature
+                self._log(f"❌ Error processing {file_name}: {task.error}")
+            elif task.status == "crashed":
+                self._log(f"❌ Error processing {file_name}: {task.error}")
+            if path in self.rerun:
+                self.rerun.discard(path)
+                self.changes.put(path)
+
+    def _shutdown(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        self.pool.cancel()
+        self.pool.close()
+        self._collect_results()
+        for path, status, records in self.statuses:
+            self.processor.add_to_report(path, records, status)
+        self.processor.write_report(self.log_callback)
+        self._log("Stopped watching.")
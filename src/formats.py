@@ -0,0 +1,33 @@
+# Kept free of third-party imports so the service and CLI can read them without loading pandas/geopandas
+import importlib.util
+
+# Output format name -> ExcelConverter writer method
+OUTPUT_FORMATS = {
+    "geojson": "convert_to_geojson",
+    "shapefile": "convert_to_shapefile",
+    "gpkg": "convert_to_geopackage",
+    "fgb": "convert_to_flatgeobuf",
+    "parquet": "convert_to_geoparquet",
+}
+DEFAULT_FORMATS = ("geojson", "shapefile")
+# Output format -> optional package its writer needs
+FORMAT_REQUIREMENTS = {
+    "parquet": "pyarrow",
+}
+
+def missing_requirement(output_format):
+    """
+    The package output_format needs that is not installed, or None; found without importing it.
+    """
+    package = FORMAT_REQUIREMENTS.get(output_format)
+    if package and importlib.util.find_spec(package) is None:
+        return package
+    return None
+
+# Named bounding boxes (min longitude, min latitude, max longitude, max latitude) for coordinate validation
+BOUNDING_BOXES = {
+    "west-java": (105.0, -8.0, 109.0, -5.5),
+}
+
+# Bump when a change alters the outputs, so incremental runs regenerate them
+CONVERTER_VERSION = "5"
@@ -0,0 +1,129 @@
+import json
+import numpy as np
+import os
+import shapely
+from src.cancellation import raise_if_cancelled
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _json_default(value):
+    """
+    Serializes the numpy and pandas values the standard encoders do not know about.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+def _crs_urn(crs):
+    from pyproj import CRS
+
+    authority = CRS.from_user_input(crs).to_authority()
+    return f"urn:ogc:def:crs:{authority[0]}::{authority[1]}" if authority else str(crs)
+
+class GeoJSONWriter:
+    """
+    Streams a GeoDataFrame to a GeoJSON FeatureCollection chunk by chunk, with geometries serialized in bulk.
+    """
+    def __init__(self, compact = True, backend = "auto", chunk_size = 5000) -> None:
+        self.compact = compact
+        self.chunk_size = chunk_size
+        if backend == "auto":
+            backend = "orjson" if orjson is not None else "json"
+        if backend == "orjson" and orjson is None:
+            raise ImportError("The orjson backend was requested but orjson is not installed.")
+        self.backend = backend
+
+    def _dumps(self, obj):
+        if self.backend == "orjson":
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if not self.compact:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=_json_default, option=option)
+        if self.compact:
+            text = json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default, allow_nan=False)
+        else:
+            text = json.dumps(obj, ensure_ascii=False, indent=4, default=_json_default, allow_nan=False)
+        return text.encode("utf-8")
+
+    @staticmethod
+    def _properties(chunk):
+        """
+        Converts a chunk to a list of property dicts with NaN and infinity replaced by None.
+        """
+        present = chunk.notna() & ~chunk.isin([np.inf, -np.inf])
+        return chunk.astype(object).where(present, None).to_dict("records")
+
+    def write(self, gdf, path, drop_columns = (), cancel_token = None, crs = None):
+        """
+        Writes a GeoDataFrame to path. Rows with a null geometry get "geometry": null.
+
+        A cancelled or failed write removes the partial file.
+        """
+        stream = self.open(path, drop_columns, cancel_token, crs)
+        try:
+            stream.append(gdf)
+        except BaseException:
+            stream.abort()
+            raise
+        stream.close()
+
+    def open(self, path, drop_columns = (), cancel_token = None, crs = None):
+        """
+        Starts a FeatureCollection at path that GeoDataFrames can be appended to one after another.
+
+        GeoJSON coordinates are WGS84 longitude/latitude; for any other crs the file names it in a
+        "crs" member (the 2008 GeoJSON convention GDAL and QGIS read).
+        """
+        return GeoJSONStream(self, path, drop_columns, cancel_token, crs)
+
+class GeoJSONStream:
+    """
+    A FeatureCollection being written: append() adds the features of a GeoDataFrame, close() ends the file.
+    """
+    def __init__(self, writer, path, drop_columns, cancel_token, crs = None) -> None:
+        self.writer = writer
+        self.path = path
+        self.drop_columns = list(drop_columns)
+        self.cancel_token = cancel_token
+        self.separator = b"," if writer.compact else b",\n"
+        self.first = True
+        crs_member = b""
+        if crs is not None and _crs_urn(crs) != _crs_urn("EPSG:4326"):
+            crs_member = b'"crs":' + writer._dumps({"type": "name", "properties": {"name": _crs_urn(crs)}}) + self.separator
+        self.file = open(path, "wb")
+        self.file.write(b'{"type":"FeatureCollection",' + crs_member + b'"features":[' if writer.compact
+                        else b'{"type": "FeatureCollection", ' + crs_member + b'"features": [\n')
+
+    def append(self, gdf):
+        geometries = shapely.to_geojson(gdf.geometry.array)
+        properties_df = gdf.drop(columns=[gdf.geometry.name, *self.drop_columns], errors="ignore")
+
+        for start in range(0, len(gdf), self.writer.chunk_size):
+            raise_if_cancelled(self.cancel_token)
+            stop = min(start + self.writer.chunk_size, len(gdf))
+            properties = self.writer._properties(properties_df.iloc[start:stop])
+            features = []
+            for geometry, props in zip(geometries[start:stop], properties):
+                geometry = b"null" if geometry is None else geometry.encode("utf-8")
+                features.append(b'{"type":"Feature","geometry":' + geometry + b',"properties":' + self.writer._dumps(props) + b"}")
+            if not self.first:
+                self.file.write(self.separator)
+            self.file.write(self.separator.join(features))
+            self.first = False
+
+    def close(self):
+        self.file.write(b"]}" if self.writer.compact else b"\n]}\n")
+        self.file.close()
+
+    def abort(self):
+        """
+        Closes and removes the unfinished file.
+        """
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,169 @@
+import re
+import functools
+import numpy as np
+import pandas as pd
+import shapely
+
+# Roles of coordinate column pairs: a point sheet has "point", a line sheet "start" and "end"
+POINT = "point"
+START = "start"
+END = "end"
+
+REASON_MISSING = "missing or non-numeric coordinates"
+REASON_OUT_OF_RANGE = "coordinates out of range"
+REASON_OUTSIDE_BBOX = "coordinates outside the bounding box"
+REASON_START = "start point missing or invalid"
+REASON_END = "end point missing or invalid"
+REASON_START_END = "start and end points missing or invalid"
+
+# A coordinate written as text, with a sign or a hemisphere (N/S/E/W, or LU/LS/BT/BB) before or after:
+# decimal degrees with a comma or point (-7,18834), or whole degrees followed by minutes and optionally
+# seconds (7°11'18.03"LS, 107 29 1.6 BT, S 7 11.3). Each part ends with its unit symbol or a space, so
+# malformed numbers such as 1.234,5 or -6.912.000 match neither form and are rejected
+_HEMISPHERE = r"LU|LS|BT|BB|[NSEW]"
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_DEGREE = r"(?:°|º|˚|DEG|D)"
+_MINUTE = r"(?:'|′|’|M)"
+_SECOND = r"(?:\"|″|''|’’)"
+COORDINATE_PATTERN = (rf"^(?P<prefix>{_HEMISPHERE})?\s*(?P<sign>[-+])?\s*"
+                      rf"(?:(?P<decimal>{_NUMBER})\s*{_DEGREE}?"
+                      rf"|(?P<degrees>\d+)(?:\s*{_DEGREE}\s*|\s+)"
+                      rf"(?:(?P<minutes>\d+)(?:\s*{_MINUTE}\s*|\s+)(?P<seconds>{_NUMBER})\s*{_SECOND}?"
+                      rf"|(?P<decimal_minutes>{_NUMBER})\s*{_MINUTE}?))"
+                      rf"\s*(?P<suffix>{_HEMISPHERE})?$")
+NEGATIVE_HEMISPHERES = ["S", "W", "LS", "BB"]
+
+def _column_key(column):
+    return re.sub(r"[^A-Z]", "", str(column).upper())
+
+def coordinate_columns(columns):
+    """
+    Finds the (longitude, latitude) column pairs of a sheet.
+
+    Returns {"start": (lon, lat), "end": (lon, lat)} for start/end sheets (TitikKoordinatAwal_*/Akhir_*),
+    {"point": (lon, lat)} for TITIK KORDINAT sheets, or {} when neither is complete.
+    Names are matched without case, spaces and underscores, so header variants of both spellings are found.
+    """
+    found = {}
+    for column in columns:
+        key = _column_key(column)
+        if key.endswith("LONGITUDE"):
+            axis = 0
+        elif key.endswith("LATITUDE"):
+            axis = 1
+        else:
+            continue
+        if "AWAL" in key:
+            role = START
+        elif "AKHIR" in key:
+            role = END
+        elif "KORDINAT" in key or "KOORDINAT" in key:
+            role = POINT
+        else:
+            continue
+        pair = found.setdefault(role, [None, None])
+        if pair[axis] is None:
+            pair[axis] = column
+
+    complete = {role: tuple(pair) for role, pair in found.items() if None not in pair}
+    if START in complete and END in complete:
+        return {START: complete[START], END: complete[END]}
+    if POINT in complete:
+        return {POINT: complete[POINT]}
+    return {}
+
+def parse_coordinates(series):
+    """
+    Converts a coordinate column to float degrees. Numbers are kept; text is parsed as decimal degrees
+    with a comma or point, or as degrees, minutes and seconds with a sign or hemisphere (COORDINATE_PATTERN).
+
+    Returns (values, parsed): the floats (NaN where nothing could be read) and the mask of the rows that
+    were read from text.
+    """
+    values = pd.to_numeric(series, errors="coerce").astype("float64")
+    text_rows = (values.isna() & series.notna()).to_numpy()
+    if not text_rows.any():
+        return values, text_rows
+
+    text = series[text_rows].astype(str).str.strip().str.upper()
+    parts = text.str.extract(COORDINATE_PATTERN)
+    decimal, degrees, minutes, seconds, decimal_minutes = (
+        pd.to_numeric(parts[name].str.replace(",", ".", regex=False), errors="coerce")
+        for name in ("decimal", "degrees", "minutes", "seconds", "decimal_minutes"))
+    minutes = minutes.fillna(decimal_minutes)
+    value = decimal.fillna(degrees + minutes / 60 + seconds.fillna(0) / 3600)
+    negative = (parts["sign"] == "-") | parts["prefix"].isin(NEGATIVE_HEMISPHERES) | parts["suffix"].isin(NEGATIVE_HEMISPHERES)
+    value = value.where(~negative, -value)
+    value = value.where(~((minutes >= 60) | (seconds >= 60)))
+
+    values[text_rows] = value.to_numpy()
+    return values, text_rows & values.notna().to_numpy()
+
+def _inside(lon, lat, bbox):
+    inside = lon.between(-180, 180) & lat.between(-90, 90)
+    if bbox is not None:
+        inside &= lon.between(bbox[0], bbox[2]) & lat.between(bbox[1], bbox[3])
+    return inside.to_numpy()
+
+def _coordinates(df, pair, bbox = None):
+    """
+    Parsed longitudes and latitudes of a column pair, swapped back on rows where they were entered the other
+    way round (only the swapped pair is in range, or in bbox), with the masks of the rows that are present,
+    valid, read from text and swapped, and each row's rejection reason.
+    """
+    lon, lon_parsed = parse_coordinates(df[pair[0]])
+    lat, lat_parsed = parse_coordinates(df[pair[1]])
+    present = (lon.notna() & lat.notna()).to_numpy()
+
+    swapped = present & ~_inside(lon, lat, bbox) & _inside(lat, lon, bbox)
+    if swapped.any():
+        lon, lat = lon.where(~swapped, lat), lat.where(~swapped, lon)
+
+    in_range = _inside(lon, lat, None)
+    valid = _inside(lon, lat, bbox)
+    reasons = np.select([~present, ~in_range, ~valid], [REASON_MISSING, REASON_OUT_OF_RANGE, REASON_OUTSIDE_BBOX], "")
+    return lon, lat, present, valid, (lon_parsed | lat_parsed) & valid, swapped & valid, reasons
+
+def build_geometry(df, columns, bbox = None):
+    """
+    Builds the geometry of every row of df from the columns found by coordinate_columns(), repairing
+    coordinates written as text and swapped longitudes and latitudes on the way.
+
+    Returns (geometry, valid, reasons, numeric, repairs): an object array of Points or LineStrings with
+    None for invalid rows (missing, out of range or outside bbox), the validity mask, the rejection reason
+    of each row ("" when valid), the coordinate columns converted to numbers and the number of valid rows
+    repaired as {"parsed": rows read from text, "swapped": rows whose pair was swapped back}.
+    """
+    if POINT in columns:
+        lon, lat, present, valid, parsed, swapped, reasons = _coordinates(df, columns[POINT], bbox)
+        geometry = np.full(len(df), None, dtype=object)
+        geometry[valid] = shapely.points(lon.to_numpy()[valid], lat.to_numpy()[valid])
+        repairs = {"parsed": int(parsed.sum()), "swapped": int(swapped.sum())}
+        return geometry, valid, reasons, {columns[POINT][0]: lon, columns[POINT][1]: lat}, repairs
+
+    start_lon, start_lat, _, start_valid, start_parsed, start_swapped, _ = _coordinates(df, columns[START], bbox)
+    end_lon, end_lat, _, end_valid, end_parsed, end_swapped, _ = _coordinates(df, columns[END], bbox)
+    valid = start_valid & end_valid
+    # (rows, 2 vertices, x/y)
+    coordinates = np.stack([np.column_stack([start_lon.to_numpy(), start_lat.to_numpy()]),
+                            np.column_stack([end_lon.to_numpy(), end_lat.to_numpy()])], axis=1)
+    geometry = np.full(len(df), None, dtype=object)
+    geometry[valid] = shapely.linestrings(coordinates[valid])
+    reasons = np.select([~start_valid & ~end_valid, ~start_valid, ~end_valid], [REASON_START_END, REASON_START, REASON_END], "")
+    numeric = {columns[START][0]: start_lon, columns[START][1]: start_lat, columns[END][0]: end_lon, columns[END][1]: end_lat}
+    repairs = {"parsed": int(((start_parsed | end_parsed) & valid).sum()), "swapped": int(((start_swapped | end_swapped) & valid).sum())}
+    return geometry, valid, reasons, numeric, repairs
+
+@functools.lru_cache(maxsize=8)
+def _transformer(source_crs, target_crs):
+    from pyproj import Transformer
+
+    return Transformer.from_crs(source_crs, target_crs, always_xy=True)
+
+def reproject(geometry, target_crs, source_crs = "EPSG:4326"):
+    """
+    Transforms an array of geometries (None allowed) to target_crs in one call, with a Transformer
+    created once per process for each pair of CRS.
+    """
+    transformer = _transformer(str(source_crs), str(target_crs))
+    return shapely.transform(geometry, lambda coordinates: np.column_stack(transformer.transform(coordinates[:, 0], coordinates[:, 1])))
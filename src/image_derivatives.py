@@ -0,0 +1,157 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from src.cancellation import raise_if_cancelled
+
+# Derivative formats -> (PIL format, file extension)
+DERIVATIVE_FORMATS = {
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+
+class DerivativeSpec:
+    """
+    One downscaled version of every extracted image: the longest side at most max_size pixels,
+    saved as progressive JPEG or WebP. Its paths go to the DOK_<NAME> column.
+    """
+    def __init__(self, name, max_size, output_format = "jpeg", quality = 80) -> None:
+        if output_format not in DERIVATIVE_FORMATS:
+            raise ValueError(f"Unknown image format '{output_format}'. Choose from: {', '.join(DERIVATIVE_FORMATS)}")
+        self.name = name
+        self.max_size = max_size
+        self.output_format = output_format
+        self.quality = quality
+
+    @property
+    def column(self):
+        return f"DOK_{self.name.upper()}"[:10]
+
+    @property
+    def folder(self):
+        # Another size, format or quality is another set of files, so changing a spec never reuses stale ones
+        return f"{self.name}_{self.max_size}_q{self.quality}"
+
+    def __repr__(self):
+        return f"{self.name}:{self.max_size}:{self.output_format}:{self.quality}"
+
+DEFAULT_DERIVATIVES = {
+    "thumb": DerivativeSpec("thumb", 256, "jpeg", 75),
+    "web": DerivativeSpec("web", 1280, "webp", 80),
+}
+
+def parse_derivatives(value):
+    """
+    Parses "thumb,web" or "thumb:320,web:1600:jpeg:85" (name[:max size[:format[:quality]]]) into specs;
+    the names thumb and web default to DEFAULT_DERIVATIVES.
+    """
+    specs = []
+    for item in value.split(","):
+        parts = [part.strip() for part in item.split(":")]
+        if not parts[0]:
+            continue
+        default = DEFAULT_DERIVATIVES.get(parts[0])
+        if default is None and len(parts) < 2:
+            raise ValueError(f"Give a size for the image derivative '{parts[0]}', e.g. {parts[0]}:640")
+        max_size = int(parts[1]) if len(parts) > 1 else default.max_size
+        output_format = parts[2].lower() if len(parts) > 2 else (default.output_format if default else "jpeg")
+        quality = int(parts[3]) if len(parts) > 3 else (default.quality if default else 80)
+        specs.append(DerivativeSpec(parts[0], max_size, output_format, quality))
+    if len({spec.column for spec in specs}) != len(specs):
+        raise ValueError("Image derivative names must be unique.")
+    return specs
+
+def _webp_supported():
+    from PIL import features
+
+    return features.check("webp")
+
+def make_derivative(source_path, target_path, spec):
+    """
+    Writes the downscaled version of one image. JPEG sources are decoded at a reduced scale (draft),
+    then thumbnail() shrinks by whole factors (reduce) before the final resampling.
+    """
+    from PIL import Image, ImageOps
+
+    pil_format, _ = DERIVATIVE_FORMATS[spec.output_format]
+    with Image.open(source_path) as image:
+        image.draft("RGB", (spec.max_size, spec.max_size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((spec.max_size, spec.max_size), Image.LANCZOS, reducing_gap=3.0)
+        if image.mode not in ("RGB", "RGBA") or (image.mode == "RGBA" and pil_format == "JPEG"):
+            image = image.convert("RGB")
+
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                if pil_format == "JPEG":
+                    image.save(target, format=pil_format, quality=spec.quality, progressive=True, optimize=True)
+                else:
+                    image.save(target, format=pil_format, quality=spec.quality, method=4)
+            os.replace(temp_path, target_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    return target_path
+
+class ImageDerivatives:
+    """
+    Derivatives of the images of the content-addressed store, under <root>/<spec folder>/<first two chars>/.
+
+    Store images are named by the hash of their content, so a derivative named after its source exists only
+    for the same content: generate() skips those and makes the others on a pool of threads (decoding and
+    resampling release the GIL).
+    """
+    def __init__(self, root, specs, workers = None, cancel_token = None) -> None:
+        self.root = root
+        self.specs = list(specs)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.cancel_token = cancel_token
+        if any(spec.output_format == "webp" for spec in self.specs) and not _webp_supported():
+            # Pillow built without libwebp
+            self.specs = [DerivativeSpec(spec.name, spec.max_size, "jpeg", spec.quality) if spec.output_format == "webp" else spec
+                          for spec in self.specs]
+        self.made = 0
+        self.skipped = 0
+        self.failed = {}  # source path -> error
+
+    def path_for(self, source_path, spec):
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        _, extension = DERIVATIVE_FORMATS[spec.output_format]
+        return os.path.join(self.root, spec.folder, stem[:2], stem + extension)
+
+    def generate(self, source_paths):
+        """
+        Makes the missing derivatives of source_paths and returns {spec name: {source path: derivative path}},
+        without the sources that could not be read.
+        """
+        paths = {spec.name: {} for spec in self.specs}
+        jobs = []
+        for source_path in dict.fromkeys(source_paths):
+            for spec in self.specs:
+                target_path = self.path_for(source_path, spec)
+                paths[spec.name][source_path] = target_path
+                if os.path.exists(target_path):
+                    self.skipped += 1
+                else:
+                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                    jobs.append((source_path, target_path, spec))
+        if not jobs:
+            return paths
+
+        def run(job):
+            raise_if_cancelled(self.cancel_token)
+            source_path, target_path, spec = job
+            try:
+                make_derivative(source_path, target_path, spec)
+                return None
+            except OSError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            for (source_path, _, spec), error in zip(jobs, executor.map(run, jobs)):
+                if error is None:
+                    self.made += 1
+                else:
+                    self.failed[source_path] = error
+                    paths[spec.name].pop(source_path, None)
+        return paths
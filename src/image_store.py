@@ -0,0 +1,120 @@
+import os
+import io
+import json
+import hashlib
+import tempfile
+from PIL import Image
+
+INDEX_FILE = "index.json"
+CHUNK_SIZE = 1024 * 1024
+
+def _sha256(zip_image):
+    digest = hashlib.sha256()
+    with zip_image.open() as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ImageStore:
+    """
+    Content-addressed image folder: every unique image is written once as <sha256><ext>.
+
+    index.json remembers the stored name of each zip fingerprint (CRC-32, size, format), so repeat runs
+    skip copying or re-encoding images already stored. CRC-32 and size can collide, so a hit only counts
+    once the member's sha256 matches the hash the stored name starts with.
+    """
+    def __init__(self, root) -> None:
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_FILE)
+        os.makedirs(root, exist_ok=True)
+        self.index = self._load_index()
+        self._dirty = False
+        self.bytes_written = 0  # size of the images this instance actually added to the store
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        """
+        Writes the index atomically, merged with entries other runs may have added meanwhile.
+        """
+        if not self._dirty:
+            return
+        index = self._load_index()
+        index.update(self.index)
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temp_path, self.index_path)
+        self.index = index
+        self._dirty = False
+
+    def _path_for(self, name):
+        return os.path.join(self.root, name[:2], name)
+
+    def _lookup(self, key, digest):
+        """
+        Returns the stored path indexed under key if it holds the content whose sha256 is digest(), else None.
+        """
+        name = self.index.get(key)
+        if name and os.path.exists(self._path_for(name)) and name.startswith(digest()):
+            return self._path_for(name)
+        return None
+
+    def _remember(self, key, name):
+        self.index[key] = name
+        self._dirty = True
+        return self._path_for(name)
+
+    def _commit(self, temp_path, name):
+        path = self._path_for(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            self.bytes_written += os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+
+    def store_raw(self, zip_image):
+        """
+        Copies the original bytes into the store, hashing them while streaming. Returns the stored path.
+        """
+        key = f"{zip_image.fingerprint}:raw"
+        path = self._lookup(key, lambda: _sha256(zip_image))
+        if path:
+            return path
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with zip_image.open() as source, os.fdopen(fd, "wb") as target:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                target.write(chunk)
+
+        name = digest.hexdigest() + zip_image.extension
+        self._commit(temp_path, name)
+        return self._remember(key, name)
+
+    def store_jpeg(self, zip_image):
+        """
+        Stores an RGB JPEG rendition of the image, keyed by the hash of the original bytes.
+        """
+        key = f"{zip_image.fingerprint}:jpeg"
+        data = zip_image.read()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._lookup(key, lambda: digest)
+        if path:
+            return path
+
+        name = digest + "_rgb.jpg"
+        if not os.path.exists(self._path_for(name)):
+            image = Image.open(io.BytesIO(data)).convert("RGB")
+            fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as target:
+                image.save(target, format="JPEG")
+            self._commit(temp_path, name)
+        return self._remember(key, name)
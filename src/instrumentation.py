@@ -0,0 +1,237 @@
+import os
+import sys
+import csv
+import json
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Share of a file's progress bar given to each stage, in the order the stages run
+STAGE_WEIGHTS = {"load": 50, "images": 20, "build": 5, "write": 25}
+# Streaming interleaves the stages chunk by chunk, so progress follows the rows read
+STREAMING_STAGE_WEIGHTS = {"load": 100}
+REPORT_FIELDS = ["file", "sheet", "stage", "wall_s", "cpu_s", "peak_rss_mb", "py_peak_mb", "rows", "images", "bytes_written",
+                 "memory_before_mb", "memory_after_mb", "memory_saved_mb"]
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process in MiB, or None when it cannot be measured.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    if psutil is not None:
+        memory = psutil.Process().memory_info()
+        return round(getattr(memory, "peak_wset", memory.rss) / (1024 * 1024), 1)
+    return None
+
+def current_rss_mb():
+    """
+    Returns the current resident set size of this process in MiB, or None when it cannot be measured.
+    """
+    if psutil is not None:
+        return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class ProgressTracker:
+    """
+    Turns (stage, done, total) updates into an overall 0-100 percentage weighted by STAGE_WEIGHTS.
+
+    Stages without a weight are ignored. Only emits when the integer percentage grows,
+    so the callback sees a monotonic sequence; `stage` is the stage of the latest update.
+    """
+    def __init__(self, callback, weights = STAGE_WEIGHTS) -> None:
+        self.callback = callback
+        self.weights = weights
+        self.offsets = {}
+        offset = 0
+        for stage, weight in weights.items():
+            self.offsets[stage] = offset
+            offset += weight
+        self.total_weight = offset
+        self.last = -1
+        self.stage = None
+
+    def update(self, stage, done, total):
+        if stage not in self.weights:
+            return
+        self.stage = stage
+        fraction = min(done / total, 1.0) if total else 1.0
+        self.emit((self.offsets[stage] + self.weights[stage] * fraction) * 100 / self.total_weight)
+
+    def emit(self, percent):
+        percent = int(percent)
+        if percent > self.last:
+            self.last = percent
+            if self.callback:
+                self.callback(percent)
+
+class StageMetrics:
+    """
+    Collects one record per stage and sheet of a file: wall and CPU time, peak RSS, rows, images and bytes written
+    (and for the optimize stage the memory of the sheet's columns before and after compaction).
+
+    Stages may nest; a parent's times exclude those of the stages run inside it.
+    With profile="tracemalloc" every record also gets the peak of Python allocations during the stage,
+    with profile="cprofile" profiling() dumps a .prof file per input.
+    """
+    def __init__(self, profile = None, profile_folder = None) -> None:
+        if profile not in (None, *PROFILE_MODES):
+            raise ValueError(f"Unknown profile mode '{profile}'. Choose from: {', '.join(PROFILE_MODES)}")
+        self.profile = profile
+        self.profile_folder = profile_folder
+        self.file = None
+        self.records = []
+        self._stack = []
+
+    def _begin(self, stage, sheet):
+        if self.profile == "tracemalloc" and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        record = {"file": self.file, "sheet": sheet, "stage": stage, "rows": None, "images": None, "bytes_written": None}
+        self._stack.append((record, time.perf_counter(), time.process_time(), [0.0, 0.0]))
+        return record
+
+    def _end(self):
+        record, wall_start, cpu_start, children = self._stack.pop()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        if self._stack:
+            parent_children = self._stack[-1][3]
+            parent_children[0] += wall
+            parent_children[1] += cpu
+        record["wall_s"] = round(wall - children[0], 6)
+        record["cpu_s"] = round(cpu - children[1], 6)
+        record["peak_rss_mb"] = peak_rss_mb()
+        if self.profile == "tracemalloc" and tracemalloc.is_tracing():
+            record["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        self.records.append(record)
+        return record
+
+    @contextmanager
+    def stage(self, stage, sheet = None):
+        """
+        Times the enclosed block; the yielded record can be given rows, images and bytes_written.
+        """
+        record = self._begin(stage, sheet)
+        try:
+            yield record
+        finally:
+            self._end()
+
+    def iterate(self, stage, iterable):
+        """
+        Yields (item, record) pairs, timing how long the iterable took to produce each item.
+        """
+        iterator = iter(iterable)
+        while True:
+            record = self._begin(stage, None)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._stack.pop()
+                return
+            except BaseException:
+                self._end()
+                raise
+            self._end()
+            yield item, record
+
+    @contextmanager
+    def profiling(self, file_path):
+        """
+        Runs the enclosed block under the configured profiler and writes its output to profile_folder.
+        """
+        if self.profile is None:
+            yield
+            return
+
+        os.makedirs(self.profile_folder, exist_ok=True)
+        stem = os.path.join(self.profile_folder, os.path.splitext(os.path.basename(file_path))[0])
+        if self.profile == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                profiler.dump_stats(stem + ".prof")
+            return
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            if started:
+                tracemalloc.stop()
+            with open(stem + ".tracemalloc.txt", "w", encoding="utf-8") as f:
+                for stat in snapshot.statistics("lineno")[:50]:
+                    f.write(f"{stat}\n")
+
+class RunReport:
+    """
+    Stage records of a whole batch, written as run_report.json (with per-stage totals) and run_report.csv.
+    """
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.records = []
+        self.files = {}
+
+    def add(self, file_path, records, status):
+        self.records.extend(records)
+        self.files[os.path.basename(file_path)] = status
+
+    def totals(self):
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["stage"], {"wall_s": 0.0, "cpu_s": 0.0, "rows": 0, "images": 0, "bytes_written": 0})
+            if "memory_saved_mb" in record:
+                total.setdefault("memory_saved_mb", 0.0)
+            for field in total:
+                total[field] += record.get(field) or 0
+        for total in totals.values():
+            total["wall_s"] = round(total["wall_s"], 6)
+            total["cpu_s"] = round(total["cpu_s"], 6)
+            if "memory_saved_mb" in total:
+                total["memory_saved_mb"] = round(total["memory_saved_mb"], 3)
+        return totals
+
+    def write(self, folder, name = "run_report"):
+        """
+        Writes the JSON and CSV reports into folder and returns the path of the JSON one.
+        """
+        json_path = os.path.join(folder, f"{name}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "wall_s": round(time.time() - self.started, 3),
+                "peak_rss_mb": peak_rss_mb(),
+                "files": self.files,
+                "totals": self.totals(),
+                "records": self.records,
+            }, f, indent=2, ensure_ascii=False)
+
+        with open(os.path.join(folder, f"{name}.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(self.records)
+        return json_path
@@ -0,0 +1,504 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import zipfile
+import threading
+from collections import deque
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.converter_service import Process
+from src.worker_pool import ConversionPool
+from src.vector_io import output_files
+from src.folder_watcher import is_workbook
+from src.formats import OUTPUT_FORMATS, DEFAULT_FORMATS, missing_requirement
+from src.progress_channel import ProgressAggregator
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUED = 16
+DEFAULT_MAX_UPLOAD_MB = 512
+MAX_LOG_LINES = 1000  # per job; the status shows the last STATUS_LOG_LINES of them
+STATUS_LOG_LINES = 20
+CHUNK_SIZE = 1024 * 1024
+TICK_SECONDS = 0.1
+# Already compressed, so the result zip stores them as they are
+STORED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".zip", ".gpkg", ".parquet")
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+
+class QueueFull(Exception):
+    """
+    Raised when a job is submitted while max_queued jobs are already waiting or running.
+    """
+
+class ConversionJob:
+    """
+    One submitted batch of workbooks: where its inputs and outputs live, and the state, progress and log
+    the API reports for it.
+    """
+    def __init__(self, job_id, folder, processor) -> None:
+        self.id = job_id
+        self.folder = folder
+        self.input_folder = os.path.join(folder, "inputs")
+        self.processor = processor  # gives the job its output folder, formats and converter options
+        self.file_paths = []
+        self.names = {}  # file path -> name shown in the status
+        self.tasks = []  # ConversionTask of each file, once submitted
+        self.status = "receiving"
+        self.progress = ProgressAggregator()
+        self.log = deque(maxlen=MAX_LOG_LINES)
+        self.failed = []
+        self.outputs = []
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def output_folder(self):
+        return self.processor.output_folder
+
+    @property
+    def running(self):
+        return any(task.status == "running" for task in self.tasks)
+
+    @property
+    def done(self):
+        return all(task.finished for task in self.tasks)
+
+    def add_file(self, file_path, name):
+        self.file_paths.append(file_path)
+        self.names[file_path] = name
+
+    def to_dict(self, log_lines = STATUS_LOG_LINES):
+        files = {self.names[file_path]: {"percent": percent, "stage": stage}
+                 for file_path, (percent, stage) in self.progress.files.items()}
+        status = {"id": self.id, "status": self.status, "progress": self.progress.overall(), "files": files,
+                  "formats": list(self.processor.formats), "failed": [self.names[file_path] for file_path in self.failed],
+                  "outputs": len(self.outputs), "created": self.created, "started": self.started, "finished": self.finished,
+                  "log": list(self.log)[-log_lines:] if log_lines else []}
+        if self.status in ("done", "failed", "cancelled"):
+            status["download"] = f"/jobs/{self.id}/outputs.zip"
+        return status
+
+class JobService:
+    """
+    Converts submitted jobs on a bounded pool of worker processes that stay warm between jobs.
+
+    The workers are started, and have imported the converter, before the first job arrives, so a small job
+    costs only its own conversion. Files are run in submission order, job after job, workers at a time;
+    at most max_queued jobs may wait or run at once and further submissions raise QueueFull. Each job has
+    its own folder under jobs_folder, with its uploaded inputs and its converted_output. Workbooks already on
+    the server are accepted only under allowed_roots.
+
+    A job's queued files can be cancelled; its files already converting run to the end.
+    """
+    def __init__(self, jobs_folder, workers = 1, formats = DEFAULT_FORMATS, max_queued = DEFAULT_MAX_QUEUED, allowed_roots = (),
+                 max_upload_mb = DEFAULT_MAX_UPLOAD_MB, log_callback = None, **process_options) -> None:
+        self.jobs_folder = os.path.abspath(jobs_folder)
+        self.formats = tuple(formats)  # for jobs that do not choose their own
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots]
+        self.max_upload_bytes = max_upload_mb * 1024 * 1024
+        self.log_callback = log_callback
+        self.process_options = process_options  # Process keyword arguments shared by every job (image_mode, streaming...)
+        self.jobs = {}  # job id -> ConversionJob, in submission order
+        self.tasks = {}  # task -> job, until the task finishes
+        self.pool = ConversionPool(self.workers, log_callback=self._task_log, progress_callback=self._task_progress,
+                                   start_callback=self._task_started, warm=True)
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()  # guards the jobs and their state; never held while the pool works
+        self._thread = None
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def start(self):
+        """
+        Starts the worker processes, waits until they are warm, then schedules jobs on a background thread.
+        """
+        os.makedirs(self.jobs_folder, exist_ok=True)
+        started = time.perf_counter()
+        self.pool.start()
+        self._log(f"Workers ready in {time.perf_counter() - started:.1f}s ({self.workers} worker(s)).")
+        self._thread = threading.Thread(target=self._run, name="JobService", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.pool.cancel()
+        self.pool.close()
+
+    def new_job(self, formats = None):
+        """
+        Creates an empty job, or raises QueueFull.
+        """
+        formats = formats or self.formats
+        unknown = [output_format for output_format in formats if output_format not in OUTPUT_FORMATS]
+        if unknown or not formats:
+            raise ValueError(f"Unknown output format(s): {', '.join(unknown)}. Choose from: {', '.join(OUTPUT_FORMATS)}")
+        for output_format in formats:
+            missing = missing_requirement(output_format)
+            if missing:
+                raise ValueError(f"The {output_format} format needs {missing}, which is not installed on the server.")
+        with self._lock:
+            active = sum(job.status in ACTIVE_STATUSES + ("receiving",) for job in self.jobs.values())
+            if active >= self.max_queued:
+                raise QueueFull(f"{active} jobs are already queued or running; try again later.")
+            job_id = uuid.uuid4().hex[:12]
+            folder = os.path.join(self.jobs_folder, job_id)
+            # Image paths relative to converted_output still point to the images once the zip is unpacked elsewhere
+            job = ConversionJob(job_id, folder, Process(folder, formats=formats, relative_image_paths=True, **self.process_options))
+            os.makedirs(job.input_folder, exist_ok=True)
+            self.jobs[job_id] = job
+        return job
+
+    def add_upload(self, job, name, stream, length):
+        """
+        Saves an uploaded workbook (or a .zip of workbooks) of length bytes read from stream into the job.
+        """
+        name = os.path.basename(name or "")
+        if not (is_workbook(name) or name.lower().endswith(".zip")):
+            raise ValueError(f"Upload an .xlsx, .xls or .zip file, not '{name}'.")
+        if length > self.max_upload_bytes:
+            raise ValueError(f"The upload is larger than {self.max_upload_bytes // (1024 * 1024)} MB.")
+
+        path = os.path.join(job.input_folder, name)
+        with open(path, "wb") as f:
+            remaining = length
+            while remaining:
+                chunk = stream.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise ValueError("The upload ended early.")
+                f.write(chunk)
+                remaining -= len(chunk)
+
+        if is_workbook(name):
+            job.add_file(path, name)
+            return
+        try:
+            with zipfile.ZipFile(path) as archive:
+                members = [member for member in archive.infolist()
+                           if not member.is_dir() and is_workbook(os.path.basename(member.filename))]
+                # Checked before anything is unpacked; reading a member stops at the size its entry declares
+                if sum(member.file_size for member in members) > self.max_upload_bytes:
+                    raise ValueError(f"The workbooks in '{name}' unpack to more than {self.max_upload_bytes // (1024 * 1024)} MB.")
+                for member in members:
+                    # Only the file name is kept, so a member cannot be written outside the job folder
+                    member_name = os.path.basename(member.filename)
+                    member_path = os.path.join(job.input_folder, member_name)
+                    if member_path in job.names:
+                        raise ValueError(f"'{name}' holds more than one workbook named '{member_name}'.")
+                    with archive.open(member) as source, open(member_path, "wb") as target:
+                        shutil.copyfileobj(source, target, CHUNK_SIZE)
+                    job.add_file(member_path, member_name)
+        except zipfile.BadZipFile:
+            raise ValueError(f"'{name}' is not a zip file.")
+        finally:
+            os.remove(path)
+
+    def add_paths(self, job, paths):
+        """
+        Adds workbooks already on the server (files, or folders of workbooks) to the job.
+        """
+        for path in paths:
+            real_path = os.path.realpath(path)
+            if not any(os.path.commonpath([real_path, root]) == root for root in self.allowed_roots):
+                raise PermissionError(f"Server paths are only accepted under: {', '.join(self.allowed_roots) or '(none configured)'}")
+            if os.path.isdir(real_path):
+                file_paths = [os.path.join(real_path, f) for f in sorted(os.listdir(real_path)) if is_workbook(f)]
+            elif os.path.isfile(real_path) and is_workbook(real_path):
+                file_paths = [real_path]
+            else:
+                raise FileNotFoundError(f"Workbook not found: {path}")
+            for file_path in file_paths:
+                job.add_file(file_path, file_path)
+
+    def submit(self, job):
+        """
+        Queues a job whose files have all been added.
+        """
+        if not job.file_paths:
+            self.discard(job)
+            raise ValueError("The job has no workbooks.")
+        processor = job.processor
+        with self._lock:
+            job.progress.start(job.file_paths)
+            job.status = "queued"
+            for file_path in job.file_paths:
+                task = self.pool.submit(file_path, processor.output_folder, processor.formats, processor.profile, processor.converter_options)
+                job.tasks.append(task)
+                self.tasks[task] = job
+        self._log(f"Job {job.id} queued with {len(job.file_paths)} file(s).")
+
+    def discard(self, job):
+        """
+        Forgets a job and removes its folder; a job still converting is cancelled instead.
+        """
+        with self._lock:
+            if job.status in ACTIVE_STATUSES:
+                return False
+            self.jobs.pop(job.id, None)
+        shutil.rmtree(job.folder, ignore_errors=True)
+        return True
+
+    def cancel(self, job):
+        with self._lock:
+            if job.status not in ACTIVE_STATUSES:
+                return
+            self.pool.cancel(job.tasks)
+            job.status = "cancelling" if job.running else "cancelled"
+            if not job.running:
+                job.finished = time.time()
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def status(self, job, log_lines = STATUS_LOG_LINES):
+        with self._lock:
+            return job.to_dict(log_lines)
+
+    def statuses(self):
+        with self._lock:
+            return [job.to_dict(0) for job in self.jobs.values()]
+
+    def health(self):
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"workers": self.workers, "busy": self.pool.busy, "max_queued": self.max_queued, "jobs": counts}
+
+    def _run(self):
+        while not self.stopped.is_set():
+            # Polling starts and collects files, and restarts the workers after a crash, outside the lock,
+            # so status requests are answered meanwhile
+            finished = self.pool.poll(timeout=TICK_SECONDS)
+            with self._lock:
+                for task in finished:
+                    self._task_finished(task)
+            if not self.pool.busy:
+                self.stopped.wait(TICK_SECONDS)
+
+    def _task_started(self, task):
+        with self._lock:
+            job = self.tasks[task]
+            if job.status == "queued":
+                job.status = "running"
+                job.started = time.time()
+            job.log.append(f"Processing file: {job.names[task.file_path]}")
+
+    def _task_log(self, task, message):
+        with self._lock:
+            job = self.tasks.get(task)
+            if job is not None:
+                job.log.append(f"[{os.path.basename(task.file_path)}] {message}")
+
+    def _task_progress(self, task, percent, stage):
+        with self._lock:
+            job = self.tasks.get(task)
+            if job is not None:
+                job.progress.update(task.file_path, percent, stage)
+
+    def _task_finished(self, task):
+        job = self.tasks.pop(task)
+        job.progress.update(task.file_path, 100)
+        name = job.names[task.file_path]
+        if task.status == "ok":
+            job.outputs.extend(os.path.relpath(path, job.output_folder) for paths in task.outputs.values() for path in paths)
+            job.log.append(f"Finished processing {name}")
+        elif task.status in ("failed", "crashed"):
+            job.failed.append(task.file_path)
+            job.log.append(f"❌ Error processing {name}: {task.error}")
+            if task.status == "crashed":
+                self._log(f"❌ A worker process stopped unexpectedly while converting {name}.")
+        self._finish_if_done(job)
+
+    def _finish_if_done(self, job):
+        # A cancelled job without running files finished when it was cancelled
+        if not job.done or job.status not in ACTIVE_STATUSES:
+            return
+        if job.status == "cancelling":
+            job.status = "cancelled"
+        else:
+            job.status = "failed" if len(job.failed) == len(job.file_paths) else "done"
+        job.finished = time.time()
+        self._log(f"Job {job.id} {job.status} in {job.finished - job.created:.1f}s "
+                  f"({len(job.file_paths) - len(job.failed)}/{len(job.file_paths)} file(s) converted).")
+
+def write_outputs_zip(job, stream):
+    """
+    Streams the outputs of a finished job to stream as a zip, file by file, without building the archive in
+    memory or on disk first. Only what its files wrote goes in (the outputs of each format, the images and
+    rejected records they refer to), laid out as in converted_output; the manifest, sheet cache, image
+    index and profiles stay on the server.
+    """
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+        for output in sorted(set(job.outputs)):
+            for path in output_files(os.path.join(job.output_folder, output)):
+                name = os.path.relpath(path, job.output_folder)
+                compression = zipfile.ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) else zipfile.ZIP_DEFLATED
+                archive.write(path, name, compress_type=compression)
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    The JSON API of the job service:
+
+        GET    /health                  workers and job counts
+        GET    /jobs                    every job's status
+        POST   /jobs?name=a.xlsx        upload a workbook (or a .zip of workbooks) as the request body
+        POST   /jobs                    {"paths": [...], "formats": [...]} with workbooks already on the server
+        GET    /jobs/<id>               status, progress, per-file stage and the end of the log
+        GET    /jobs/<id>/log           the whole log, as text
+        GET    /jobs/<id>/outputs.zip   the outputs and images of a finished job, streamed as one zip
+        DELETE /jobs/<id>               cancel the queued files of a job, or remove a finished job
+
+    ?formats=geojson,gpkg chooses the output formats of an upload.
+    """
+    server_version = "SurveyConverterJobs/1"
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def log_message(self, format, *args):
+        self.service._log(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, message):
+        self._send_json(status, {"error": message})
+
+    def _route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        return parts, parse_qs(url.query)
+
+    def _job(self, parts):
+        job = self.service.get(parts[1]) if len(parts) > 1 else None
+        if job is None:
+            self._send_error(404, "No such job.")
+        return job
+
+    def do_GET(self):
+        parts, _ = self._route()
+        if parts == ["health"]:
+            return self._send_json(200, self.service.health())
+        if parts == ["jobs"]:
+            return self._send_json(200, self.service.statuses())
+        if not parts or parts[0] != "jobs" or len(parts) > 3:
+            return self._send_error(404, "Not found.")
+        job = self._job(parts)
+        if job is None:
+            return
+        if len(parts) == 2:
+            return self._send_json(200, self.service.status(job))
+        if parts[2] == "log":
+            data = "\n".join(self.service.status(job, MAX_LOG_LINES)["log"]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if parts[2] == "outputs.zip":
+            return self._send_outputs(job)
+        self._send_error(404, "Not found.")
+
+    def _send_outputs(self, job):
+        if job.status not in ("done", "failed", "cancelled"):
+            return self._send_error(409, f"Job {job.id} is {job.status}; download its outputs once it has finished.")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Disposition", f'attachment; filename="{job.id}.zip"')
+        # No Content-Length: the zip is written as it is read, and the end of the connection ends it
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            write_outputs_zip(job, self.wfile)
+        except (BrokenPipeError, ConnectionResetError):
+            self.service._log(f"⚠️ Warning: The download of job {job.id} was interrupted.")
+
+    def do_POST(self):
+        parts, query = self._route()
+        if parts != ["jobs"]:
+            return self._send_error(404, "Not found.")
+        if "Content-Length" not in self.headers:
+            return self._send_error(411, "Send a Content-Length header.")
+        try:
+            length = int(self.headers["Content-Length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._send_error(400, "The Content-Length header must be a number of bytes.")
+
+        json_body = self.headers.get("Content-Type", "").startswith("application/json")
+        body = {}
+        if json_body:
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._send_error(400, "The request body is not valid JSON.")
+        formats = body.get("formats") or [output_format for value in query.get("formats", []) for output_format in value.split(",") if output_format]
+
+        try:
+            job = self.service.new_job(formats)
+        except QueueFull as e:
+            return self._send_error(503, str(e))
+        except ValueError as e:
+            return self._send_error(400, str(e))
+
+        try:
+            if json_body:
+                self.service.add_paths(job, body.get("paths", []))
+            else:
+                self.service.add_upload(job, query.get("name", [""])[0], self.rfile, length)
+            self.service.submit(job)
+        except PermissionError as e:
+            self.service.discard(job)
+            return self._send_error(403, str(e))
+        except (ValueError, FileNotFoundError) as e:
+            self.service.discard(job)
+            return self._send_error(400, str(e))
+        except Exception:
+            self.service.discard(job)
+            raise
+        self._send_json(202, self.service.status(job))
+
+    def do_DELETE(self):
+        parts, _ = self._route()
+        if not parts or parts[0] != "jobs" or len(parts) != 2:
+            return self._send_error(404, "Not found.")
+        job = self._job(parts)
+        if job is None:
+            return
+        if job.status in ACTIVE_STATUSES:
+            self.service.cancel(job)
+            return self._send_json(202, self.service.status(job))
+        self.service.discard(job)
+        self._send_json(200, {"id": job.id, "status": "removed"})
+
+class JobServer(ThreadingHTTPServer):
+    """
+    HTTP front end of a JobService. Binds to localhost by default; port 0 picks a free port (see url).
+    """
+    daemon_threads = True
+
+    def __init__(self, service, host = "127.0.0.1", port = DEFAULT_PORT) -> None:
+        super().__init__((host, port), _JobRequestHandler)
+        self.service = service
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
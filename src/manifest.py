@@ -0,0 +1,90 @@
+import os
+import json
+import hashlib
+import tempfile
+
+MANIFEST_FILE = "manifest.json"
+CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ConversionManifest:
+    """
+    Records, per input file, its size, mtime and content hash together with the outputs it produced.
+
+    Used to skip inputs that have not changed and to regenerate only outputs that are stale or missing.
+    """
+    def __init__(self, output_folder, converter_version) -> None:
+        self.output_folder = output_folder
+        self.converter_version = converter_version
+        self.path = os.path.join(output_folder, MANIFEST_FILE)
+        self.entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f).get("inputs", {})
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        fd, temp_path = tempfile.mkstemp(dir=self.output_folder, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"converter_version": self.converter_version, "inputs": self.entries}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    def _outputs_exist(self, paths):
+        return all(os.path.exists(os.path.join(self.output_folder, path)) for path in paths)
+
+    def _unchanged(self, file_path, entry):
+        """
+        Size and mtime decide quickly; only a touched file of the same size is re-hashed.
+        """
+        stat = os.stat(file_path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime == entry["mtime"]:
+            return True
+        if file_sha256(file_path) != entry["sha256"]:
+            return False
+        entry["mtime"] = stat.st_mtime
+        return True
+
+    def formats_to_write(self, file_path, formats):
+        """
+        Returns the formats that must be (re)written for file_path; empty when everything is up to date.
+        """
+        entry = self.entries.get(self._key(file_path))
+        if (entry is None or entry.get("converter_version") != self.converter_version
+                or not self._unchanged(file_path, entry)
+                or not self._outputs_exist(entry["outputs"].get("images", []))):
+            return list(formats)
+
+        outputs = entry["outputs"]
+        return [output_format for output_format in formats
+                if output_format not in outputs or not self._outputs_exist(outputs[output_format])]
+
+    def record(self, file_path, outputs):
+        """
+        Stores the fingerprint of file_path and the outputs ({format: [paths]}) written for it.
+        """
+        key = self._key(file_path)
+        stat = os.stat(file_path)
+        sha256 = file_sha256(file_path)
+
+        entry = self.entries.get(key)
+        if entry is None or entry["sha256"] != sha256 or entry.get("converter_version") != self.converter_version:
+            entry = {"outputs": {}}
+        entry.update(size=stat.st_size, mtime=stat.st_mtime, sha256=sha256, converter_version=self.converter_version)
+        for output_format, paths in outputs.items():
+            entry["outputs"][output_format] = [os.path.relpath(path, self.output_folder) for path in paths]
+        self.entries[key] = entry
@@ -0,0 +1,205 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from src.cancellation import raise_if_cancelled
+from src.worker_pool import POOL_CONTEXT
+from src.vector_io import gdal_config, remove_output, write_vector
+
+# Output format -> (OGR driver, file extension) of the per-partition files
+PARTITION_FORMATS = {
+    "shapefile": ("ESRI Shapefile", ".shp"),
+    "geojson": ("GeoJSON", ".geojson"),
+    "gpkg": ("GPKG", ".gpkg"),
+    "fgb": ("FlatGeobuf", ".fgb"),
+}
+UNNAMED = "unnamed"
+
+def sanitize_name(value):
+    """
+    File-system safe name of a key value: letters, digits, spaces and underscores are kept, anything else
+    becomes an underscore. Empty and missing values are named "unnamed".
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return UNNAMED
+    name = "".join(c if c.isalnum() or c in (" ", "_") else "_" for c in str(value)).strip()
+    return name or UNNAMED
+
+def _write_partition(gdf, path, driver):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Overwrite, rather than append to, the output of an earlier run
+    remove_output(path)
+    write_vector(gdf, path, driver)
+
+def _write_partition_batch(gdf, jobs, driver):
+    """
+    Writes a batch of partitions inside a pool process; gdf holds only the rows of the batch,
+    jobs are (row positions in gdf, path). Returns how many were written.
+    """
+    for positions, path in jobs:
+        _write_partition(gdf.take(positions), path, driver)
+    return len(jobs)
+
+class PartitionedExport:
+    """
+    Splits a layer into one output per distinct combination of key columns, plus an Excel index of the partitions.
+
+    Files are laid out as <key 1>/<key 2>/.../<last key>.<ext>, so partitioning the provincial roads by
+    ["kabupaten/", "nama jalan"] gives one folder per kabupaten with one file per road. With layout="layers"
+    every partition becomes a layer of one GeoPackage instead. Each partition is written with a single
+    to_file call; with `workers` > 1 the files are written by a process pool, in batches of partitions so
+    each worker receives its rows once.
+    """
+    def __init__(self, output_folder, keys, output_format = "shapefile", layout = "files", workers = 1,
+                 index_name = "partition_index.xlsx", log_callback = None, progress_callback = None, cancel_token = None) -> None:
+        if not keys:
+            raise ValueError("At least one key column is needed to partition a layer.")
+        if output_format not in PARTITION_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}'. Choose from: {', '.join(PARTITION_FORMATS)}")
+        if layout not in ("files", "layers"):
+            raise ValueError(f"Unknown layout '{layout}'. Choose from: files, layers")
+        self.output_folder = output_folder
+        self.keys = list(keys)
+        self.output_format = "gpkg" if layout == "layers" else output_format
+        self.layout = layout
+        self.workers = workers or os.cpu_count() or 1
+        self.index_name = index_name
+        self.log_callback = log_callback
+        self.progress_callback = progress_callback
+        self.cancel_token = cancel_token
+
+    def _log(self, message):
+        if self.log_callback:
+            self.log_callback(message)
+
+    def partitions(self, gdf):
+        """
+        Returns [(key values, names, row positions)] sorted by key, where names are the sanitized key values
+        made unique ignoring case: two values that sanitize to the same name, or to names differing only in
+        case, get _2, _3... suffixes.
+        """
+        missing = [key for key in self.keys if key not in gdf.columns]
+        if missing:
+            raise KeyError(f"The layer is missing the key column(s): {', '.join(missing)}")
+
+        groups = gdf.groupby(self.keys, sort=True, dropna=False).indices
+        partitions = []
+        assigned = {}  # (parent names, key value) -> name
+        used = set()  # (parent names, name), lowercased
+        for values, positions in groups.items():
+            values = values if isinstance(values, tuple) else (values,)
+            names = []
+            for value in values:
+                # Names only have to be unique among siblings: the same road name may exist in two kabupaten.
+                # Windows file systems ignore case, so "Bandung" and "BANDUNG" must not share a folder either
+                parent = tuple(name.lower() for name in names)
+                key = (parent, None if value is None or (not isinstance(value, str) and pd.isna(value)) else value)
+                name = assigned.get(key)
+                if name is None:
+                    name = base = sanitize_name(value)
+                    suffix = 1
+                    while (parent, name.lower()) in used:
+                        suffix += 1
+                        name = f"{base}_{suffix}"
+                    used.add((parent, name.lower()))
+                    assigned[key] = name
+                names.append(name)
+            partitions.append((values, names, positions))
+        return partitions
+
+    def _partition_path(self, names):
+        _, extension = PARTITION_FORMATS[self.output_format]
+        return os.path.join(self.output_folder, *names[:-1], names[-1] + extension)
+
+    def _write_files(self, gdf, partitions, paths):
+        driver, _ = PARTITION_FORMATS[self.output_format]
+        if self.workers == 1 or len(partitions) == 1:
+            for done, ((_, _, positions), path) in enumerate(zip(partitions, paths), start=1):
+                raise_if_cancelled(self.cancel_token)
+                _write_partition(gdf.take(positions), path, driver)
+                self._update_progress(done, len(partitions))
+            return
+
+        # A few batches per worker keeps the pool busy and progress moving without pickling per partition
+        jobs = list(zip((positions for _, _, positions in partitions), paths))
+        batch_count = min(len(jobs), self.workers * 4)
+        batches = [jobs[start::batch_count] for start in range(batch_count)]
+        done = 0
+        with ProcessPoolExecutor(max_workers=min(self.workers, batch_count), mp_context=POOL_CONTEXT) as executor:
+            pending = set()
+            for batch in batches:
+                rows = np.concatenate([positions for positions, _ in batch])
+                offsets = np.cumsum([0] + [len(positions) for positions, _ in batch])
+                batch_jobs = [(np.arange(offsets[i], offsets[i + 1]), path) for i, (_, path) in enumerate(batch)]
+                pending.add(executor.submit(_write_partition_batch, gdf.take(rows), batch_jobs, driver))
+            try:
+                while pending:
+                    raise_if_cancelled(self.cancel_token)
+                    finished, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done += future.result()
+                        self._update_progress(done, len(partitions))
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+
+    def export(self, source):
+        """
+        Writes every partition of source (a GeoDataFrame or the path of any vector file) and the index,
+        and returns the index as a DataFrame.
+        """
+        gdf = gpd.read_file(source) if isinstance(source, (str, os.PathLike)) else source
+        partitions = self.partitions(gdf)
+        os.makedirs(self.output_folder, exist_ok=True)
+        self._log(f"Splitting {len(gdf)} feature(s) by {', '.join(self.keys)} into {len(partitions)} partition(s)")
+
+        rows = []
+        if self.layout == "layers":
+            geopackage_path = os.path.join(self.output_folder, "partitions.gpkg")
+            remove_output(geopackage_path)
+            layers = set()
+            # Every layer reopens the GeoPackage; without this each open and commit waits for an fsync.
+            # A failed export leaves a file that is rewritten from scratch next time anyway
+            with gdal_config(OGR_SQLITE_SYNCHRONOUS="OFF"):
+                for done, (values, names, positions) in enumerate(partitions, start=1):
+                    raise_if_cancelled(self.cancel_token)
+                    layer = base = "_".join(names)
+                    suffix = 1
+                    while layer.lower() in layers:
+                        # Joined names can meet: ("a_b", "c") and ("a", "b_c"); GeoPackage layer names ignore case
+                        suffix += 1
+                        layer = f"{base}_{suffix}"
+                    layers.add(layer.lower())
+                    write_vector(gdf.take(positions), geopackage_path, "GPKG", layer=layer)
+                    rows.append((values, len(positions), os.path.basename(geopackage_path), layer))
+                    self._update_progress(done, len(partitions))
+        else:
+            paths = [self._partition_path(names) for _, names, _ in partitions]
+            self._write_files(gdf, partitions, paths)
+            rows = [(values, len(positions), os.path.relpath(path, self.output_folder), None)
+                    for (values, _, positions), path in zip(partitions, paths)]
+
+        index = self._index(rows)
+        if self.index_name:
+            index_path = os.path.join(self.output_folder, self.index_name)
+            index.to_excel(index_path, index=False)
+            self._log(f"Partition index written to {index_path}")
+        return index
+
+    def _index(self, rows):
+        """
+        One row per partition: the key values (most specific key first, as in jalan_kabupaten.xlsx),
+        the feature count and where it was written.
+        """
+        index = pd.DataFrame([values[::-1] for values, _, _, _ in rows], columns=self.keys[::-1])
+        index["features"] = [features for _, features, _, _ in rows]
+        index["output"] = [output for _, _, output, _ in rows]
+        if self.layout == "layers":
+            index["layer"] = [layer for _, _, _, layer in rows]
+        return index.sort_values(self.keys[::-1], kind="stable").reset_index(drop=True)
+
+    def _update_progress(self, done, total):
+        if self.progress_callback:
+            self.progress_callback(int(done * 100 / total))
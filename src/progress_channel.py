@@ -0,0 +1,109 @@
+import os
+import time
+import threading
+
+# Lines handed to the UI per frame; the rest are summarized (the log file keeps them all)
+MAX_LINES_PER_FRAME = 200
+
+class ProgressAggregator:
+    """
+    Overall 0-100 progress of a batch from the progress of each of its files, whatever order or
+    thread the updates come from. Files are weighted equally; progress never goes backwards.
+    """
+    def __init__(self, file_paths = ()) -> None:
+        self.files = {}
+        self.start(file_paths)
+
+    def start(self, file_paths):
+        self.files = {file_path: [0, None] for file_path in file_paths}
+
+    def update(self, file_path, percent, stage = None):
+        """
+        Records a file's progress (and current stage) and returns the overall percentage.
+        """
+        entry = self.files.setdefault(file_path, [0, None])
+        entry[0] = max(entry[0], min(int(percent), 100))
+        if stage is not None:
+            entry[1] = stage
+        return self.overall()
+
+    def overall(self):
+        if not self.files:
+            return 0
+        return sum(percent for percent, _ in self.files.values()) // len(self.files)
+
+    def active(self):
+        """
+        {file: (percent, stage)} of the files started but not finished.
+        """
+        return {file_path: (percent, stage) for file_path, (percent, stage) in self.files.items() if 0 < percent < 100}
+
+class ChannelFrame:
+    """
+    What the UI shows for one frame: new log lines, how many were left out, overall and per-file progress.
+    """
+    def __init__(self, lines, skipped, overall, active) -> None:
+        self.lines = lines
+        self.skipped = skipped
+        self.overall = overall
+        self.active = active
+
+class ProgressChannel:
+    """
+    Thread-safe hand-off of log lines and progress from conversion threads to a UI that polls it.
+
+    Producers call log() and file_progress() from any thread; the UI calls frame() on a timer at its own
+    frame rate, so it redraws once per frame however many events arrived. A frame carries at most
+    max_lines lines: errors are always kept, the newest lines fill the rest and the others are counted.
+    Every line is also appended, timestamped, to log_path.
+    """
+    def __init__(self, log_path = None, max_lines = MAX_LINES_PER_FRAME) -> None:
+        self.max_lines = max_lines
+        self.progress = ProgressAggregator()
+        self._lines = []
+        self._lock = threading.Lock()
+        self._log_file = None
+        self.log_path = log_path
+        if log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+            self._log_file = open(log_path, "a", encoding="utf-8")
+
+    def start_batch(self, file_paths):
+        with self._lock:
+            self.progress.start(file_paths)
+
+    def log(self, message):
+        with self._lock:
+            self._lines.append(message)
+            if self._log_file is not None:
+                self._log_file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {message}\n")
+
+    def file_progress(self, file_path, percent, stage = None):
+        with self._lock:
+            self.progress.update(file_path, percent, stage)
+
+    def frame(self):
+        """
+        Takes the lines logged since the previous frame and the current progress.
+        """
+        with self._lock:
+            lines, self._lines = self._lines, []
+            overall = self.progress.overall()
+            active = self.progress.active()
+            if self._log_file is not None:
+                self._log_file.flush()
+
+        skipped = 0
+        if len(lines) > self.max_lines:
+            older, newest = lines[:-self.max_lines], lines[-self.max_lines:]
+            errors = [line for line in older if line.startswith("❌")][-self.max_lines:]
+            kept = errors + newest[len(errors):]
+            skipped = len(lines) - len(kept)
+            lines = kept
+        return ChannelFrame(lines, skipped, overall, active)
+
+    def close(self):
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
@@ -0,0 +1,124 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+# Columns of the provincial road layer (SHP JALAN PROVINSI)
+ROAD_NAME_COLUMN = "nama jalan"
+KABUPATEN_COLUMN = "kabupaten/"
+DEFAULT_TOLERANCE_M = 25.0
+
+# Columns added to the survey layers (at most 10 characters, so shapefiles keep them whole)
+SNAP_ROAD = "NAMA_JALAN"
+SNAP_KABUPATEN = "KABUPATEN"
+SNAP_CHAINAGE = "CHAINAGE_M"
+SNAP_CHAINAGE_END = "CHAIN_END"
+SNAP_DISTANCE = "SNAP_DIST"
+
+class RoadNetwork:
+    """
+    A reference road layer indexed for bulk nearest-segment queries.
+
+    Multi-part roads are split into their parts and everything is projected to the UTM zone of the layer,
+    so distances and chainages are in metres; the chainage of a part starts where the previous parts of
+    its road end. snap() matches every point of a survey layer to the nearest road part within tolerance
+    metres with one query on the layer's STRtree.
+    """
+    def __init__(self, roads, name_column = ROAD_NAME_COLUMN, kabupaten_column = KABUPATEN_COLUMN) -> None:
+        roads = gpd.read_file(roads) if isinstance(roads, (str, os.PathLike)) else roads
+        missing = [column for column in (name_column, kabupaten_column) if column not in roads.columns]
+        if missing:
+            raise KeyError(f"The road layer is missing the column(s): {', '.join(missing)}")
+        if roads.crs is None:
+            raise ValueError("The road layer has no CRS.")
+
+        roads = roads[roads.geometry.notna() & ~roads.geometry.is_empty]
+        self.crs = roads.estimate_utm_crs()
+        parts = roads[[name_column, kabupaten_column, roads.geometry.name]].to_crs(self.crs).reset_index(drop=True)
+        parts["road_id"] = parts.index
+        parts = parts.explode(index_parts=False, ignore_index=True)
+        lengths = parts.geometry.length
+        # Chainage of the first vertex of each part: the length of the parts before it on the same road
+        parts["offset"] = lengths.groupby(parts["road_id"]).cumsum() - lengths
+
+        self.parts = parts
+        self.names = parts[name_column].to_numpy(dtype=object)
+        self.kabupaten = parts[kabupaten_column].to_numpy(dtype=object)
+        self.offsets = parts["offset"].to_numpy()
+        self.geometries = parts.geometry.to_numpy()
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def _nearest(self, points, tolerance):
+        """
+        Index of the nearest part of each point (-1 when none is within tolerance) and its distance.
+        """
+        matched = np.full(len(points), -1)
+        distances = np.full(len(points), np.nan)
+        present = ~(shapely.is_missing(points) | shapely.is_empty(points))
+        if present.any():
+            (point_index, part_index), part_distances = self.tree.query_nearest(
+                points[present], max_distance=tolerance, return_distance=True, all_matches=False)
+            positions = np.flatnonzero(present)[point_index]
+            matched[positions] = part_index
+            distances[positions] = part_distances
+        return matched, distances
+
+    def _chainage(self, matched, points):
+        chainage = np.full(len(points), np.nan)
+        found = matched >= 0
+        chainage[found] = self.offsets[matched[found]] + shapely.line_locate_point(self.geometries[matched[found]], points[found])
+        return chainage
+
+    def snap(self, gdf, tolerance = DEFAULT_TOLERANCE_M, lines = False):
+        """
+        Returns the road columns for the rows of gdf as a DataFrame with gdf's index: road name, kabupaten,
+        chainage and snapping distance in metres, empty where no road is within tolerance.
+
+        Points are snapped as they are. A LineString is matched by its first vertex; with lines=True the
+        end chainage column gives the position of its last vertex along the same road part.
+        """
+        geometries = gdf.geometry.to_crs(self.crs).to_numpy()
+        is_line = shapely.get_type_id(geometries) == 1
+        points = geometries.copy()
+        points[is_line] = shapely.get_point(geometries[is_line], 0)
+
+        matched, distances = self._nearest(points, tolerance)
+        found = matched >= 0
+        columns = {
+            SNAP_ROAD: np.where(found, self.names[matched], None),
+            SNAP_KABUPATEN: np.where(found, self.kabupaten[matched], None),
+            SNAP_CHAINAGE: np.round(self._chainage(matched, points), 1),
+            SNAP_DISTANCE: np.round(distances, 2),
+        }
+        if lines:
+            ends = np.full(len(points), None, dtype=object)
+            ends[is_line] = shapely.get_point(geometries[is_line], -1)
+            columns[SNAP_CHAINAGE_END] = np.round(self._chainage(np.where(is_line, matched, -1), ends), 1)
+        return pd.DataFrame(columns, index=gdf.index)
+
+_networks = {}
+_networks_lock = threading.Lock()
+
+def _signature(path):
+    paths = [path]
+    if path.lower().endswith(".shp"):
+        # A shapefile's attributes live in its .dbf
+        paths.append(os.path.splitext(path)[0] + ".dbf")
+    return tuple((os.path.getsize(p), os.path.getmtime(p)) for p in paths if os.path.exists(p))
+
+def load_road_network(path):
+    """
+    The RoadNetwork of a road file, built once per process: pool workers reuse it between files,
+    and a road file replaced on disk is loaded again.
+    """
+    key = (os.path.abspath(path), _signature(path))
+    with _networks_lock:
+        network = _networks.get(key)
+        if network is None:
+            network = _networks[key] = RoadNetwork(path)
+    return network
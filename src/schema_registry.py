@@ -0,0 +1,153 @@
+import hashlib
+import threading
+from src.geometry import coordinate_columns
+
+class SheetSchema:
+    """
+    Declarative description of one family of survey sheets.
+
+    A header belongs to the schema when it has every `required` column and, if `match_prefixes` is given,
+    at least one column starting with one of them. Columns containing one of `drop_patterns` (any case)
+    are removed, `rename` maps flattened header names to final names, columns starting with
+    `binary_prefixes` hold 1/empty ticks and `dtypes` are applied to the columns that exist.
+    """
+    def __init__(self, name, required = ("DETAIL LOKASI",), match_prefixes = (), binary_prefixes = (),
+                 drop_patterns = ("rekap",), rename = None, dtypes = None) -> None:
+        self.name = name
+        self.required = tuple(required)
+        self.match_prefixes = tuple(match_prefixes)
+        self.binary_prefixes = tuple(binary_prefixes)
+        self.drop_patterns = tuple(pattern.lower() for pattern in drop_patterns)
+        self.rename = rename or {}
+        self.dtypes = dtypes or {}
+
+    def missing(self, columns):
+        """
+        What the header lacks to belong to this schema (empty when it matches).
+        """
+        missing = [column for column in self.required if column not in columns]
+        if self.match_prefixes and not any(column.startswith(self.match_prefixes) for column in columns):
+            missing.append(" or ".join(f"{prefix}*" for prefix in self.match_prefixes))
+        return missing
+
+# Tried in order; the first one that matches a header wins
+DEFAULT_SCHEMAS = [
+    SheetSchema("rambu", match_prefixes=("JENIS RAMBU",), binary_prefixes=("JENIS RAMBU", "LOKASI PEMASANGAN")),
+    SheetSchema("survey", binary_prefixes=("LOKASI PEMASANGAN",)),
+]
+
+class CompiledLayout:
+    """
+    Everything derived from one header layout: which parsed columns to keep, their final names and dtypes,
+    the binary and coordinate columns. apply() turns the raw parsed rows of a sheet into its DataFrame.
+    """
+    def __init__(self, fingerprint, schema, source_columns, keep, columns, dtypes, missing) -> None:
+        self.fingerprint = fingerprint
+        self.schema = schema
+        self.source_columns = source_columns  # flattened header names, before dropping and renaming
+        self.keep = keep
+        self.columns = columns
+        self.dtypes = dtypes
+        self.missing = missing  # why no schema matched; empty for known layouts
+        binary_prefixes = schema.binary_prefixes if schema else ()
+        self.binary_columns = [column for column in columns if binary_prefixes and column.startswith(binary_prefixes)]
+        self.coordinate_columns = coordinate_columns(columns)
+
+    @property
+    def known(self):
+        return self.schema is not None
+
+    @property
+    def name(self):
+        return self.schema.name if self.schema else "unknown"
+
+    def describe(self):
+        return f"missing {', '.join(self.missing)}; header fingerprint {self.fingerprint}"
+
+    def to_dict(self):
+        """
+        JSON-serializable state, restored by SchemaRegistry.restore().
+        """
+        return {"fingerprint": self.fingerprint, "schema": self.schema.name if self.schema else None,
+                "source_columns": self.source_columns, "keep": self.keep, "columns": self.columns,
+                "dtypes": {column: str(dtype) for column, dtype in self.dtypes.items()}, "missing": self.missing}
+
+    def apply(self, df):
+        """
+        Selects, renames and types the columns of a frame parsed without header, in one pass each.
+        """
+        df = df.iloc[:, self.keep]
+        df.columns = self.columns
+        if self.dtypes:
+            df = df.astype(self.dtypes)
+        return df
+
+class SchemaRegistry:
+    """
+    Compiles header layouts against the registered schemas and caches them by header fingerprint,
+    so sheets sharing a layout (most of them) skip header parsing and column matching.
+    """
+    def __init__(self, schemas = None) -> None:
+        self.schemas = list(DEFAULT_SCHEMAS if schemas is None else schemas)
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(header_rows):
+        return hashlib.sha1(repr(header_rows).encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def version(self):
+        """
+        Fingerprint of the registered schemas; changes whenever a schema is added or edited.
+        """
+        return hashlib.sha1(repr([vars(schema) for schema in self.schemas]).encode("utf-8")).hexdigest()[:16]
+
+    def restore(self, state):
+        """
+        CompiledLayout from CompiledLayout.to_dict(), or None when its schema is no longer registered.
+        """
+        schema = next((schema for schema in self.schemas if schema.name == state["schema"]), None)
+        if state["schema"] is not None and schema is None:
+            return None
+        return CompiledLayout(state["fingerprint"], schema, state["source_columns"], state["keep"], state["columns"],
+                              state["dtypes"], state["missing"])
+
+    def compile(self, header_rows, parse_header):
+        """
+        Returns the CompiledLayout of a sheet's header rows (padded to the sheet width), compiling it on
+        first sight; parse_header turns the rows into flattened column names the way the reader does.
+        """
+        fingerprint = self.fingerprint(header_rows)
+        layout = self._layouts.get(fingerprint)
+        if layout is not None:
+            return layout
+
+        source_columns = parse_header(header_rows)
+
+        schema, missing = None, []
+        for candidate in self.schemas:
+            candidate_missing = candidate.missing(source_columns)
+            if not candidate_missing:
+                schema, missing = candidate, []
+                break
+            # Reported against the last, most general schema
+            missing = candidate_missing
+
+        if schema is None:
+            keep = list(range(len(source_columns)))
+            columns = source_columns
+            dtypes = {}
+        else:
+            keep = [i for i, column in enumerate(source_columns)
+                    if not any(pattern in column.lower() for pattern in schema.drop_patterns)]
+            columns = [schema.rename.get(source_columns[i], source_columns[i]) for i in keep]
+            dtypes = {column: dtype for column, dtype in schema.dtypes.items() if column in columns}
+
+        layout = CompiledLayout(fingerprint, schema, source_columns, keep, columns, dtypes, missing)
+        with self._lock:
+            self._layouts.setdefault(fingerprint, layout)
+        return layout
+
+# Shared by every reader of a process, so pool workers keep their compiled layouts between files
+SCHEMA_REGISTRY = SchemaRegistry()
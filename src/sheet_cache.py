@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import shutil
+import numbers
+import hashlib
+import datetime
+import tempfile
+from src.manifest import file_sha256
+
+ENTRY_FILE = "entry.json"
+MIB = 1024 * 1024
+DEFAULT_CACHE_MB = 1024
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _encode_value(value):
+    """
+    One value of a mixed object column as JSON text, [type, text], or None for None.
+    """
+    import pandas as pd
+
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return json.dumps(["s", value], ensure_ascii=False)
+    if isinstance(value, bool) or type(value).__name__ == "bool_":
+        return json.dumps(["b", int(value)])
+    if isinstance(value, numbers.Integral):
+        return json.dumps(["i", str(int(value))])
+    if isinstance(value, numbers.Real):
+        # repr() gives back the same float, nan and inf included
+        return json.dumps(["f", repr(float(value))])
+    if value is pd.NaT:
+        return json.dumps(["nat", ""])
+    if isinstance(value, pd.Timestamp):
+        return json.dumps(["ts", value.isoformat()])
+    if isinstance(value, datetime.datetime):
+        return json.dumps(["dt", value.isoformat()])
+    if isinstance(value, datetime.date):
+        return json.dumps(["d", value.isoformat()])
+    if isinstance(value, datetime.time):
+        return json.dumps(["tm", value.isoformat()])
+    if isinstance(value, datetime.timedelta):
+        return json.dumps(["td", [value.days, value.seconds, value.microseconds]])
+    raise TypeError(f"Cannot cache a value of type {type(value).__name__}")
+
+def _decode_value(text):
+    import pandas as pd
+
+    kind, value = json.loads(text)
+    if kind == "s":
+        return value
+    if kind == "b":
+        return bool(value)
+    if kind == "i":
+        return int(value)
+    if kind == "f":
+        return float(value)
+    if kind == "nat":
+        return pd.NaT
+    if kind == "ts":
+        return pd.Timestamp(value)
+    if kind == "dt":
+        return datetime.datetime.fromisoformat(value)
+    if kind == "d":
+        return datetime.date.fromisoformat(value)
+    if kind == "tm":
+        return datetime.time.fromisoformat(value)
+    if kind == "td":
+        return datetime.timedelta(days=value[0], seconds=value[1], microseconds=value[2])
+    raise ValueError(f"Unknown cached value type '{kind}'")
+
+def _folder_size(path):
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return size
+
+class CachedWorkbook:
+    """
+    The cleaned sheets of one workbook as they were before building geometries: DataFrames, header layouts
+    and the stored images their DOKUMENTASI columns point to.
+    """
+    def __init__(self, sheets, layouts, images) -> None:
+        self.sheets = sheets
+        self.layouts = layouts
+        self.images = images
+
+class SheetCache:
+    """
+    Parsed-sheet cache: the cleaned DataFrames of a workbook stored as Parquet, so a re-export with other
+    output settings (another format, a CRS) skips reading the xlsx and extracting its images.
+
+    Entries are keyed by the content hash of the workbook, the converter version, the schema registry
+    version and the image mode, and live in <root>/<key>/ with one Parquet file per sheet. Object columns
+    Arrow cannot type (numbers mixed with "-" placeholders) are stored as JSON text, a [type, text] pair per
+    value; nothing is pickled, as the cache often sits on a shared folder and reading it must never run code.
+    Every column gets its original dtype back, so a cached run builds the same outputs as a fresh one.
+    Once the cache exceeds max_mb the least recently used entries are removed. Without pyarrow the cache
+    stays disabled.
+
+    pandas is imported on first use, so the CLI can read DEFAULT_CACHE_MB without loading it.
+    """
+    def __init__(self, root, converter_version, registry, max_mb = DEFAULT_CACHE_MB, image_mode = "raw") -> None:
+        self.root = root
+        self.converter_version = converter_version
+        self.registry = registry
+        self.max_bytes = max_mb * MIB
+        self.image_mode = image_mode
+        self.enabled = _has_pyarrow()
+
+    def key(self, file_path):
+        parts = [file_sha256(file_path), self.converter_version, self.registry.version, self.image_mode]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+
+    def get(self, key):
+        """
+        Returns the CachedWorkbook stored under key, or None when it is missing, unreadable or stale.
+        """
+        if not self.enabled:
+            return None
+        import pandas as pd
+
+        entry_folder = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(entry_folder, ENTRY_FILE), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # The images live in the output folder and may have been deleted since
+        if not all(os.path.exists(path) for path in entry["images"]):
+            return None
+
+        sheets, layouts = {}, {}
+        try:
+            for sheet in entry["sheets"]:
+                layout = self.registry.restore(sheet["layout"])
+                if layout is None:
+                    return None
+                df = pd.read_parquet(os.path.join(entry_folder, sheet["file"]))
+                for column in sheet["encoded"]:
+                    # Only None is stored as null; a float NaN has its own encoding
+                    decoded = df[column].map(_decode_value, na_action="ignore").astype(object)
+                    df[column] = decoded.where(df[column].notna(), None)
+                sheets[sheet["name"]] = df.astype(sheet["dtypes"])
+                layouts[sheet["name"]] = layout
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        # The entry's modification time orders the least recently used eviction
+        os.utime(os.path.join(entry_folder, ENTRY_FILE))
+        return CachedWorkbook(sheets, layouts, entry["images"])
+
+    def put(self, key, workbook):
+        """
+        Stores a CachedWorkbook under key, then evicts entries until the cache fits in max_mb.
+        Returns False (and stores nothing) when a sheet cannot be written as Parquet.
+        """
+        if not self.enabled:
+            return False
+        os.makedirs(self.root, exist_ok=True)
+        temp_folder = tempfile.mkdtemp(dir=self.root, suffix=".tmp")
+        try:
+            sheets = []
+            for index, (name, df) in enumerate(workbook.sheets.items()):
+                sheet_file = f"{index}.parquet"
+                encoded = self._write_sheet(df, os.path.join(temp_folder, sheet_file))
+                sheets.append({"name": name, "file": sheet_file, "encoded": encoded,
+                               "dtypes": {column: str(dtype) for column, dtype in df.dtypes.items()},
+                               "layout": workbook.layouts[name].to_dict()})
+            with open(os.path.join(temp_folder, ENTRY_FILE), "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "sheets": sheets, "images": workbook.images}, f)
+
+            entry_folder = os.path.join(self.root, key)
+            shutil.rmtree(entry_folder, ignore_errors=True)
+            os.replace(temp_folder, entry_folder)
+        except Exception:
+            # Caching is an optimization: whatever stops it must not fail the conversion
+            shutil.rmtree(temp_folder, ignore_errors=True)
+            return False
+        self.evict()
+        return True
+
+    @staticmethod
+    def _write_sheet(df, path):
+        """
+        Writes one sheet as Parquet, encoding the values of object columns Arrow cannot type; returns those columns.
+        """
+        import pyarrow as pa
+
+        encoded = {}
+        for column in df.columns:
+            if df[column].dtype != object:
+                continue
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowException, TypeError, ValueError):
+                encoded[column] = df[column].map(_encode_value).astype(object)
+        df.assign(**encoded).to_parquet(path)
+        return list(encoded)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is no larger than max_bytes.
+        """
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir() or entry.name.endswith(".tmp"):
+                continue
+            try:
+                last_used = os.path.getmtime(os.path.join(entry.path, ENTRY_FILE))
+            except OSError:
+                last_used = 0
+            entries.append((last_used, _folder_size(entry.path), entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
@@ -0,0 +1,213 @@
+import os
+import json
+import contextlib
+import pandas as pd
+
+SHAPEFILE_EXTENSIONS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+def output_files(path):
+    """
+    Files of a written output that exist, with the sidecar files of a shapefile.
+    """
+    if path.endswith(".shp"):
+        stem = path[:-len(".shp")]
+        return [stem + extension for extension in SHAPEFILE_EXTENSIONS if os.path.exists(stem + extension)]
+    return [path] if os.path.exists(path) else []
+
+def output_size(path):
+    """
+    Size in bytes of a written output, counting the sidecar files of a shapefile.
+    """
+    return sum(os.path.getsize(file_path) for file_path in output_files(path))
+
+def remove_output(path):
+    """
+    Deletes a written output, with the sidecar files of a shapefile.
+    """
+    for file_path in output_files(path):
+        os.remove(file_path)
+
+def _has_pyogrio():
+    try:
+        import pyogrio  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+@contextlib.contextmanager
+def gdal_config(**options):
+    """
+    Sets GDAL configuration options for the writes inside the block, then restores the previous values.
+    """
+    if not _has_pyogrio():
+        import fiona
+
+        with fiona.Env(**options):
+            yield
+        return
+
+    import pyogrio
+
+    previous = {name: pyogrio.get_gdal_config_option(name) for name in options}
+    pyogrio.set_gdal_config_options(options)
+    try:
+        yield
+    finally:
+        pyogrio.set_gdal_config_options(previous)
+
+def vector_io_options(gdf, driver):
+    """
+    Picks the fastest available engine for GeoDataFrame.to_file: pyogrio, with Arrow when pyarrow is installed.
+    """
+    if not _has_pyogrio():
+        return {}
+
+    options = {"engine": "pyogrio"}
+    # Arrow writes and FlatGeobuf's spatial index both reject rows with a null geometry
+    has_null_geometry = gdf.geometry.isna().any()
+    if has_null_geometry:
+        if driver == "FlatGeobuf":
+            options["layer_options"] = {"SPATIAL_INDEX": "NO"}
+        return options
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return options
+    options["use_arrow"] = True
+    return options
+
+def write_vector(gdf, path, driver, layer = None, layer_options = None, append = False):
+    """
+    Writes gdf with GeoDataFrame.to_file and the options of vector_io_options.
+
+    fiona, the engine used without pyogrio, cannot map categorical columns to a field type, so they are
+    written from their values instead.
+    """
+    options = vector_io_options(gdf, driver)
+    if "engine" not in options:
+        categorical = [column for column in gdf.columns if isinstance(gdf[column].dtype, pd.CategoricalDtype)]
+        if categorical:
+            gdf = gdf.copy()
+            for column in categorical:
+                gdf[column] = gdf[column].astype(object).where(gdf[column].notna(), None)
+    if append:
+        # Appending through Arrow matches fields by their full name, which fails for
+        # the names the Shapefile driver truncated when it created the layer
+        options.pop("use_arrow", None)
+        options["mode"] = "a"
+    elif layer_options:
+        options["layer_options"] = {**options.get("layer_options", {}), **layer_options}
+    if layer is not None:
+        options["layer"] = layer
+    gdf.to_file(path, driver=driver, **options)
+
+class ChunkSchema:
+    """
+    Column dtypes fixed by the first chunk of a sheet, so every later chunk appends to the same fields.
+    """
+    def __init__(self, gdf) -> None:
+        self.dtypes = {}
+        for column in gdf.columns:
+            if column == gdf.geometry.name:
+                continue
+            series = gdf[column]
+            if series.isna().all():
+                # Nothing to learn a type from; a text field accepts whatever later chunks hold
+                self.dtypes[column] = object
+            else:
+                self.dtypes[column] = series.dtype
+
+    def conform(self, gdf):
+        """
+        Casts the columns of gdf to the schema in place and returns how many values could not be kept.
+        """
+        lost = 0
+        for column, dtype in self.dtypes.items():
+            if column not in gdf.columns:
+                gdf[column] = None
+                continue
+            series = gdf[column]
+            if series.dtype == dtype:
+                continue
+            if dtype is object or pd.api.types.is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+                gdf[column] = series.astype(object).where(series.isna(), series.astype(str))
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                converted = pd.to_numeric(series, errors="coerce")
+                lost += int((converted.isna() & series.notna()).sum())
+                if pd.api.types.is_integer_dtype(dtype):
+                    # Integer fields truncate fractions
+                    lost += int((converted.notna() & (converted % 1 != 0)).sum())
+                gdf[column] = converted
+            else:
+                gdf[column] = series.astype(dtype)
+        return lost
+
+class VectorChunkWriter:
+    """
+    Writes a GeoDataFrame chunk by chunk to one OGR layer: the first chunk creates it, later ones are appended.
+
+    abort() removes a file the writer created; a layer of a shared GeoPackage is left to the caller, which
+    removes the whole file.
+    """
+    def __init__(self, path, driver, layer = None, layer_options = None) -> None:
+        self.path = path
+        self.driver = driver
+        self.layer = layer
+        self.layer_options = layer_options or {}
+        self.started = False
+
+    def append(self, gdf):
+        write_vector(gdf, self.path, self.driver, layer=self.layer, layer_options=self.layer_options, append=self.started)
+        self.started = True
+
+    def close(self):
+        pass
+
+    def abort(self):
+        if self.started and self.layer is None:
+            remove_output(self.path)
+
+class GeoParquetChunkWriter:
+    """
+    Writes a GeoDataFrame chunk by chunk as the row groups of one GeoParquet file (needs pyarrow).
+
+    Chunks are converted with plain pyarrow: the attributes through Table.from_pandas and the geometry as
+    WKB, described by GeoParquet "geo" metadata. The metadata has no bbox, which would be the first chunk's.
+    """
+    def __init__(self, path) -> None:
+        self.path = path
+        self.writer = None
+
+    def append(self, gdf):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import shapely
+
+        geometry_name = gdf.geometry.name
+        table = pa.Table.from_pandas(pd.DataFrame(gdf.drop(columns=geometry_name)), preserve_index=False)
+        table = table.append_column(geometry_name, pa.array(shapely.to_wkb(gdf.geometry.to_numpy()), type=pa.binary()))
+        if self.writer is None:
+            # Columns empty in the first chunk are typed as text
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema],
+                               metadata={**(table.schema.metadata or {}), b"geo": self._geo_metadata(gdf)})
+            self.writer = pq.ParquetWriter(self.path, schema)
+        self.writer.write_table(table.cast(self.writer.schema, safe=False))
+
+    @staticmethod
+    def _geo_metadata(gdf):
+        column = {"encoding": "WKB", "geometry_types": []}
+        if gdf.crs is not None:
+            column["crs"] = gdf.crs.to_json_dict()
+        geo = {"version": "1.0.0", "primary_column": gdf.geometry.name, "columns": {gdf.geometry.name: column}}
+        return json.dumps(geo).encode("utf-8")
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def abort(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
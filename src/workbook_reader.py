@@ -0,0 +1,291 @@
+import openpyxl
+import pandas as pd
+from pandas.io.parsers import TextParser
+from src.xlsx_images import XlsxImageArchive
+from src.cancellation import raise_if_cancelled
+from src.schema_registry import SCHEMA_REGISTRY
+
+HEADER_ROWS = [2, 3, 4]
+FIRST_DATA_ROW = 6
+CANCEL_CHECK_ROWS = 1000
+
+class SheetData:
+    """
+    Everything the converter needs from one sheet, read in a single pass.
+    """
+    def __init__(self, name, title, df, images, layout = None) -> None:
+        self.name = name
+        self.title = title
+        self.df = df
+        self.images = images
+        self.layout = layout
+
+    @property
+    def columns(self):
+        return list(self.df.columns)
+
+class SheetStream:
+    """
+    One sheet read lazily: title, columns and image anchors up front, data rows as DataFrame chunks.
+
+    Each chunk is indexed like the rows of the full sheet would be (Excel row - FIRST_DATA_ROW), so
+    image anchors map onto it the same way. chunk_rows is read before every chunk and may be lowered
+    while iterating.
+    """
+    def __init__(self, name, title, columns, images, chunk_rows, layout = None) -> None:
+        self.name = name
+        self.title = title
+        self.columns = columns
+        self.images = images
+        self.chunk_rows = chunk_rows
+        self.layout = layout
+        self.chunks = None
+
+class ImageAnchorIndex:
+    """
+    Embedded images of one sheet, indexed by the column and row of their top-left anchor.
+    """
+    def __init__(self, anchors) -> None:
+        self._by_cell = {}
+        for column, row, image in anchors:
+            self._by_cell[(column, row)] = image
+
+    def __len__(self):
+        return len(self._by_cell)
+
+    def get(self, column, row):
+        return self._by_cell.get((column, row))
+
+    def rows_in(self, column, first_row=FIRST_DATA_ROW, last_row=None):
+        """
+        Returns the sorted rows of a column that hold an image, from first_row up to last_row (inclusive).
+        """
+        return sorted(row for image_column, row in self._by_cell
+                      if image_column == column and row >= first_row and (last_row is None or row <= last_row))
+
+class WorkbookReader:
+    """
+    Per-file workbook session: the workbook is opened once, shared by all sheets and closed at the end.
+    """
+    def __init__(self, file_path, cancel_token = None, progress_callback = None, registry = None) -> None:
+        self.file_path = file_path
+        self.registry = registry or SCHEMA_REGISTRY
+        self.cancel_token = cancel_token
+        self.progress_callback = progress_callback  # called with the fraction (0-1) of the workbook read so far
+        self.workbook = None
+        self.images = None
+        self._image_indexes = {}
+        self._sheet_position = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        if self.workbook is None:
+            # Images are read straight from the zip, so openpyxl never has to load them
+            self.workbook = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True, keep_links=False)
+            self.images = XlsxImageArchive(self.file_path)
+        return self
+
+    def close(self):
+        if self.workbook is not None:
+            self.workbook.close()
+            self.workbook = None
+        self.images = None
+        self._image_indexes = {}
+
+    def read_sheets(self):
+        """
+        Yields a SheetData (title, flattened header, data rows and image anchors) per sheet.
+        """
+        self.open()
+        sheets = self.workbook.worksheets
+        for index, sheet in enumerate(sheets):
+            raise_if_cancelled(self.cancel_token)
+            self._sheet_position = (index, len(sheets))
+            yield self.read_sheet(sheet)
+            self._report_progress(1.0)
+
+    def _report_progress(self, sheet_fraction):
+        if self.progress_callback and self._sheet_position:
+            index, count = self._sheet_position
+            self.progress_callback((index + sheet_fraction) / count)
+
+    def stream_sheets(self, chunk_rows):
+        """
+        Yields a SheetStream per sheet; a sheet's chunks must be consumed before the next sheet is requested.
+        """
+        self.open()
+        sheets = self.workbook.worksheets
+        for index, sheet in enumerate(sheets):
+            raise_if_cancelled(self.cancel_token)
+            self._sheet_position = (index, len(sheets))
+            yield self.stream_sheet(sheet, chunk_rows)
+            self._report_progress(1.0)
+
+    def stream_sheet(self, sheet, chunk_rows):
+        """
+        Reads the title and header rows of a worksheet and returns a SheetStream over its data rows.
+
+        Only chunk_rows rows are held at a time. Cells right of the header are ignored.
+        """
+        declared_rows = sheet.max_row
+        sheet.reset_dimensions()
+        row_iterator = sheet.iter_rows(values_only=True)
+        rows = [self._trim_row(next(row_iterator, ())) for _ in range(HEADER_ROWS[-1] + 1)]
+        width = max(len(row) for row in rows)
+        rows = [row + [""] * (width - len(row)) for row in rows]
+
+        title = next((value for value in rows[0] if value != ""), None)
+        layout = self.compile_layout(rows)
+
+        stream = SheetStream(sheet.title, title, layout.columns, self.image_index(sheet.title), chunk_rows, layout)
+        stream.chunks = self._data_chunks(row_iterator, stream, width, declared_rows)
+        return stream
+
+    def compile_layout(self, rows):
+        """
+        Returns the CompiledLayout of a sheet from its first rows (title and header, padded to the sheet width).
+        """
+        if len(rows) <= HEADER_ROWS[-1]:
+            raise ValueError(f"Sheet has no header rows {[row + 1 for row in HEADER_ROWS]}.")
+        return self.registry.compile(tuple(tuple(rows[i]) for i in HEADER_ROWS), self._parse_header)
+
+    @classmethod
+    def _parse_header(cls, header_rows):
+        width = len(header_rows[0])
+        rows = [[""] * width for _ in range(HEADER_ROWS[0])] + [list(row) for row in header_rows]
+        cls._fill_header(rows)
+        # The header parsed alone gets the same names (and duplicate suffixes) as parsed with the data
+        header = TextParser(rows, header=HEADER_ROWS, skip_blank_lines=False).read()
+        return cls._flatten_columns(header.columns)
+
+    def _data_chunks(self, row_iterator, stream, width, declared_rows):
+        chunk = []
+        blank_rows = []  # held back until a non-empty row follows, so trailing empty rows are dropped
+        first_index = 0
+        for row_number, row in enumerate(row_iterator, HEADER_ROWS[-1] + 1):
+            if row_number % CANCEL_CHECK_ROWS == 0:
+                raise_if_cancelled(self.cancel_token)
+                if declared_rows:
+                    self._report_progress(min(row_number / declared_rows, 1.0))
+            converted = self._trim_row(row)[:width]
+            if not converted:
+                blank_rows.append(converted)
+                continue
+            chunk.extend(blank_rows)
+            blank_rows = []
+            chunk.append(converted)
+            if len(chunk) >= stream.chunk_rows:
+                yield self._chunk_frame(chunk, width, stream.layout, first_index)
+                first_index += len(chunk)
+                chunk = []
+        if chunk:
+            yield self._chunk_frame(chunk, width, stream.layout, first_index)
+
+    @classmethod
+    def _chunk_frame(cls, chunk, width, layout, first_index):
+        df = cls._data_frame([row + [""] * (width - len(row)) for row in chunk], layout)
+        df.index = range(first_index, first_index + len(df))
+        return df
+
+    @staticmethod
+    def _data_frame(rows, layout):
+        """
+        Parses data rows (padded to the header width) and applies the sheet's compiled layout.
+        """
+        if not rows:
+            return pd.DataFrame(columns=layout.columns)
+        return layout.apply(TextParser(rows, header=None, skip_blank_lines=False).read())
+
+    def image_index(self, sheet_name):
+        """
+        Returns the ImageAnchorIndex of a sheet, building it on first use.
+        """
+        if sheet_name not in self._image_indexes:
+            self.open()
+            self._image_indexes[sheet_name] = ImageAnchorIndex(self.images.image_anchors(sheet_name))
+        return self._image_indexes[sheet_name]
+
+    def read_sheet(self, sheet):
+        """
+        Parses one worksheet into a SheetData.
+        """
+        rows = self._sheet_rows(sheet)
+
+        title_row = rows[0] if rows else []
+        title = next((value for value in title_row if value != ""), None)
+
+        layout = self.compile_layout(rows)
+        df = self._data_frame(rows[HEADER_ROWS[-1] + 1:], layout)
+
+        return SheetData(sheet.title, title, df, self.image_index(sheet.title), layout)
+
+    def _sheet_rows(self, sheet):
+        """
+        Reads cell values the same way pandas' openpyxl reader does.
+        """
+        # The declared dimension is only an estimate, good enough for progress but not for reading
+        declared_rows = sheet.max_row
+        sheet.reset_dimensions()
+        rows = []
+        last_row_with_data = -1
+        for row_number, row in enumerate(sheet.iter_rows(values_only=True)):
+            if row_number % CANCEL_CHECK_ROWS == 0:
+                raise_if_cancelled(self.cancel_token)
+                if declared_rows:
+                    self._report_progress(min(row_number / declared_rows, 1.0))
+            converted = self._trim_row(row)
+            if converted:
+                last_row_with_data = row_number
+            rows.append(converted)
+
+        rows = rows[:last_row_with_data + 1]
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    @staticmethod
+    def _fill_header(rows):
+        """
+        Forward fills merged header cells, staying inside the parent header like pandas does.
+        """
+        if len(rows) <= HEADER_ROWS[-1]:
+            raise ValueError(f"Sheet has no header rows {[row + 1 for row in HEADER_ROWS]}.")
+
+        control_row = [True] * len(rows[0])
+        for header_row in HEADER_ROWS:
+            row = rows[header_row]
+            last = row[0]
+            for i in range(1, len(row)):
+                if not control_row[i]:
+                    last = row[i]
+                if row[i] == "":
+                    row[i] = last
+                else:
+                    control_row[i] = False
+                    last = row[i]
+
+    @staticmethod
+    def _flatten_columns(columns):
+        return ["_".join([str(c) for c in col if "Unnamed" not in str(c)]).strip() for col in columns.values]
+
+    @classmethod
+    def _trim_row(cls, row):
+        """
+        Converted cell values of a row, without its trailing empty cells.
+        """
+        converted = [cls._convert_cell(value) for value in row]
+        while converted and converted[-1] == "":
+            converted.pop()
+        return converted
+
+    @staticmethod
+    def _convert_cell(value):
+        if value is None:
+            return ""
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
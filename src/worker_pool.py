@@ -0,0 +1,308 @@
+import os
+import queue
+import weakref
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from src.cancellation import CancellationToken, ConversionCancelled
+from src.instrumentation import StageMetrics
+from src.xlsx_images import sheet_names
+
+# Pools are started from threads (the GUI's ConversionThread, the folder watcher, the job service), and a forked
+# child of a multithreaded process can deadlock on a lock another thread held; workers are spawned instead
+POOL_CONTEXT = multiprocessing.get_context("spawn")
+FINISHED_STATUSES = ("ok", "failed", "cancelled", "crashed")
+CRASH_MESSAGE = "the worker process stopped unexpectedly"
+
+# Set in each pool process by init_worker: the queue carries ("log" | "progress", task id, value) events back
+# (progress values are (percent, stage)), the token wraps the multiprocessing.Event the parent sets on cancel
+_event_queue = None
+_cancel_token = None
+
+def init_worker(event_queue, cancel_event, warm = False):
+    global _event_queue, _cancel_token
+    _event_queue = event_queue
+    _cancel_token = CancellationToken(cancel_event)
+    if warm:
+        # Loaded once per worker process, so no file pays for pandas, geopandas and openpyxl
+        import src.converter_worker  # noqa: F401
+
+def _warm_up():
+    return os.getpid()
+
+def output_claims(file_path, output_folder):
+    """
+    Names a conversion of file_path writes in output_folder that another workbook may write too: one per
+    sheet, as every output of a sheet is named after it, and the workbook name (its GeoPackage and rejected
+    records), lowercased for case-insensitive file systems. A workbook whose sheets cannot be listed claims
+    the whole folder.
+    """
+    folder = os.path.normcase(os.path.abspath(output_folder))
+    names = sheet_names(file_path)
+    if names is None:
+        return {(folder, None)}
+    workbook = os.path.splitext(os.path.basename(file_path))[0]
+    return {(folder, "workbook:" + workbook.lower())} | {(folder, "sheet:" + name.lower()) for name in names}
+
+def _collide(claims, other):
+    if claims & other:
+        return True
+    # (folder, None) covers everything written in the folder
+    whole = {folder for folder, name in claims | other if name is None}
+    return any(folder in whole for folder, _ in claims) and any(folder in whole for folder, _ in other)
+
+def convert_in_worker(task_id, output_folder, file_path, formats, profile, converter_options):
+    """
+    Converts one file inside a pool process, reporting log lines and progress through the event queue.
+    Returns (status, outputs or error message, stage metrics), so the metrics of a failed file are kept too.
+    """
+    from src.converter_service import Process
+    from src.converter_worker import ExcelConverter
+
+    metrics = StageMetrics(profile, os.path.join(output_folder, "profiles"))
+    converter = ExcelConverter(output_folder,
+                               lambda message: _event_queue.put(("log", task_id, message)),
+                               None,
+                               cancel_token=_cancel_token,
+                               metrics=metrics,
+                               **converter_options)
+    tracker = converter.progress
+    tracker.callback = lambda percent: _event_queue.put(("progress", task_id, (percent, tracker.stage)))
+    try:
+        return "ok", Process.convert_file(converter, file_path, formats), metrics.records
+    except ConversionCancelled:
+        return "cancelled", None, metrics.records
+    except Exception as e:
+        return "failed", str(e), metrics.records
+
+class ConversionTask:
+    """
+    One file submitted to a ConversionPool. status goes from "queued" to "running", then to "ok", "failed",
+    "cancelled" or "crashed" (its worker process died, on every attempt). outputs are the paths written,
+    by format; error says why it failed; records are its stage metrics. claims are the output names it shares
+    with other workbooks (see output_claims).
+    """
+    def __init__(self, task_id, file_path, output_folder, formats, profile, converter_options, claims = frozenset()) -> None:
+        self.id = task_id
+        self.file_path = file_path
+        self.output_folder = output_folder
+        self.formats = list(formats)
+        self.profile = profile
+        self.converter_options = converter_options
+        self.claims = claims
+        self.status = "queued"
+        self.attempts = 0
+        self.outputs = {}
+        self.error = None
+        self.records = []
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def started(self):
+        return self.attempts > 0
+
+class ConversionPool:
+    """
+    Converts files on a pool of spawned worker processes, the one driver behind Process, FolderWatcher
+    and JobService.
+
+    submit() queues a file and returns its ConversionTask; at most `workers` tasks are handed to the processes
+    at a time, in submission order. Workbooks whose outputs would have the same names (the same sheet names
+    in one output folder) run one after another instead of overwriting each other's files. poll() relays
+    the log and progress events of running tasks to the callbacks and returns the tasks that finished since
+    the last call. When a worker dies the pool is restarted and the tasks that were running are tried again,
+    crash_retries times, since any of them may have taken it down; queued tasks are not affected. With
+    warm=True every worker imports the converter at start(), before the first file arrives.
+
+    submit() and cancel() may be called from any thread, poll() and the callbacks run on the thread driving
+    the pool. Callbacks are called without any lock held: log_callback(task, message),
+    progress_callback(task, percent, stage) and start_callback(task).
+    """
+    def __init__(self, workers, log_callback = None, progress_callback = None, start_callback = None, warm = False, crash_retries = 1) -> None:
+        self.workers = workers
+        self.log_callback = log_callback
+        self.progress_callback = progress_callback
+        self.start_callback = start_callback
+        self.warm = warm
+        self.crash_retries = crash_retries
+        self.event_queue = POOL_CONTEXT.Queue()
+        self.cancel_event = POOL_CONTEXT.Event()
+        self._ids = itertools.count(1)
+        self._tasks = weakref.WeakValueDictionary()  # task id -> task, for events that arrive after the result
+        self._queued = deque()
+        self._running = {}  # future -> task
+        self._finished = []  # cancelled before they started, handed out by the next poll()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._closed = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.cancel()
+        self.close()
+        return False
+
+    @property
+    def busy(self):
+        return len(self._running)
+
+    @property
+    def active(self):
+        """
+        Whether some task is still queued, running or waiting to be returned by poll().
+        """
+        with self._lock:
+            return bool(self._queued or self._running or self._finished)
+
+    def start(self):
+        self._executor = self._new_executor()
+
+    def _new_executor(self):
+        executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=POOL_CONTEXT, initializer=init_worker,
+                                       initargs=(self.event_queue, self.cancel_event, self.warm))
+        if self.warm:
+            # The pool starts its processes on demand: one task per worker starts them all now
+            for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+                future.result()
+        return executor
+
+    def submit(self, file_path, output_folder, formats, profile = None, converter_options = None):
+        task = ConversionTask(next(self._ids), file_path, output_folder, formats, profile, converter_options or {},
+                              output_claims(file_path, output_folder))
+        with self._lock:
+            self._tasks[task.id] = task
+            self._queued.append(task)
+        return task
+
+    def cancel(self, tasks = None):
+        """
+        Cancels the given tasks that have not started yet, or with no tasks every queued task and, through
+        the shared event, the running ones too, which stop at their next check.
+        """
+        with self._lock:
+            if tasks is None:
+                self.cancel_event.set()
+                tasks = list(self._queued)
+            for task in tasks:
+                if task.status == "queued":
+                    self._queued.remove(task)
+                    task.status = "cancelled"
+                    self._finished.append(task)
+
+    def poll(self, timeout = 0):
+        """
+        Starts queued tasks on free workers, waits up to timeout seconds for a running one to finish, relays
+        the events that arrived and returns the tasks that finished.
+        """
+        self._start_queued()
+        if self._running and timeout:
+            wait(list(self._running), timeout=timeout, return_when=FIRST_COMPLETED)
+        self._drain_events()
+
+        finished = []
+        crashed = False
+        for future in [future for future in self._running if future.done()]:
+            task = self._running.pop(future)
+            try:
+                task.status, result, task.records = future.result()
+            except BrokenProcessPool:
+                crashed = True
+                self._crashed(task, finished)
+                continue
+            except Exception as e:
+                # The result could not be sent back, e.g. it failed to pickle
+                task.status, result = "failed", str(e)
+            if task.status == "ok":
+                task.outputs = result
+            elif task.status == "failed":
+                task.error = result
+            finished.append(task)
+
+        if crashed:
+            # Every task of a broken pool fails with it; none of them is known to be the culprit
+            for future in list(self._running):
+                self._crashed(self._running.pop(future), finished)
+            self._executor.shutdown(wait=False)
+            if not self._closed:
+                self._executor = self._new_executor()
+
+        with self._lock:
+            finished = self._finished + finished
+            self._finished = []
+        return finished
+
+    def _crashed(self, task, finished):
+        if task.attempts <= self.crash_retries and not self._closed:
+            task.status = "queued"
+            with self._lock:
+                self._queued.appendleft(task)
+            return
+        task.status = "crashed"
+        task.error = CRASH_MESSAGE
+        finished.append(task)
+
+    def _next_task(self):
+        """
+        The first queued task whose outputs collide with none of the running tasks nor of the tasks queued
+        before it, so colliding files keep their submission order.
+        """
+        held = [task.claims for task in self._running.values()]
+        for task in self._queued:
+            if not any(_collide(task.claims, claims) for claims in held):
+                return task
+            held.append(task.claims)
+        return None
+
+    def _start_queued(self):
+        while not self._closed and len(self._running) < self.workers:
+            with self._lock:
+                task = self._next_task()
+                if task is None:
+                    return
+                self._queued.remove(task)
+                task.status = "running"
+            task.attempts += 1
+            future = self._executor.submit(convert_in_worker, task.id, task.output_folder, task.file_path, task.formats,
+                                           task.profile, task.converter_options)
+            self._running[future] = task
+            if self.start_callback:
+                self.start_callback(task)
+
+    def _drain_events(self):
+        while True:
+            try:
+                kind, task_id, value = self.event_queue.get_nowait()
+            except queue.Empty:
+                return
+            task = self._tasks.get(task_id)
+            if task is None:
+                continue
+            if kind == "log":
+                if self.log_callback:
+                    self.log_callback(task, value)
+            elif self.progress_callback and not task.finished:
+                self.progress_callback(task, *value)
+
+    def close(self):
+        """
+        Waits for the running tasks and stops the worker processes; queued tasks are never started.
+        Call poll() afterwards to collect the tasks that were running.
+        """
+        self._closed = True
+        with self._lock:
+            for task in self._queued:
+                task.status = "cancelled"
+                self._finished.append(task)
+            self._queued.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
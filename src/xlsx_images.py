@@ -0,0 +1,130 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "xdr": "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+}
+R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+R_EMBED = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
+DRAWING_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/drawing"
+
+# Formats written to disk byte for byte, everything else is transcoded to JPEG
+PASSTHROUGH_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif")
+
+def sheet_names(file_path):
+    """
+    Names of the sheets of an xlsx, read from xl/workbook.xml alone; None when it is not a readable xlsx.
+    """
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError):
+        return None
+    return [sheet.get("name") for sheet in workbook.iter(f"{{{NS['main']}}}sheet")]
+
+class ZipImage:
+    """
+    An image embedded in the xlsx zip, read lazily from its xl/media member.
+    """
+    def __init__(self, archive, member) -> None:
+        self.archive = archive
+        self.member = member
+
+    @property
+    def extension(self):
+        return posixpath.splitext(self.member)[1].lower()
+
+    @property
+    def fingerprint(self):
+        """
+        CRC-32, size and format from the zip directory: identifies the content without reading it.
+        """
+        info = self.archive.getinfo(self.member)
+        return f"{info.CRC:08x}-{info.file_size}{self.extension}"
+
+    @property
+    def needs_transcode(self):
+        return self.extension not in PASSTHROUGH_EXTENSIONS
+
+    def open(self):
+        return self.archive.open(self.member)
+
+    def read(self):
+        return self.archive.read(self.member)
+
+class XlsxImageArchive:
+    """
+    Reads image anchors from the drawing parts of an xlsx zip, without openpyxl or PIL.
+    """
+    def __init__(self, file_path) -> None:
+        self.file_path = file_path
+        self.archive = zipfile.ZipFile(file_path)
+        self._sheet_parts = None
+
+    def close(self):
+        self.archive.close()
+
+    def _read_xml(self, member):
+        return ET.fromstring(self.archive.read(member))
+
+    def _relationships(self, part):
+        """
+        Returns {relationship id: (type, resolved target)} for a part, or {} if it has none.
+        """
+        rels_member = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+        if rels_member not in self.archive.NameToInfo:
+            return {}
+
+        relationships = {}
+        for rel in self._read_xml(rels_member).findall("rel:Relationship", NS):
+            target = rel.get("Target")
+            if rel.get("TargetMode") == "External":
+                continue
+            if target.startswith("/"):
+                target = target.lstrip("/")
+            else:
+                target = posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+            relationships[rel.get("Id")] = (rel.get("Type"), target)
+        return relationships
+
+    def sheet_parts(self):
+        """
+        Maps sheet names to their worksheet part inside the zip.
+        """
+        if self._sheet_parts is None:
+            workbook_rels = self._relationships("xl/workbook.xml")
+            self._sheet_parts = {}
+            for sheet in self._read_xml("xl/workbook.xml").iter(f"{{{NS['main']}}}sheet"):
+                _, target = workbook_rels[sheet.get(R_ID)]
+                self._sheet_parts[sheet.get("name")] = target
+        return self._sheet_parts
+
+    def image_anchors(self, sheet_name):
+        """
+        Lists (column letter, row, ZipImage) for every picture anchored on the sheet.
+        """
+        # Imported here, so sheet_names() can be used without loading openpyxl
+        from openpyxl.utils import get_column_letter
+
+        anchors = []
+        sheet_part = self.sheet_parts()[sheet_name]
+        for rel_type, drawing_part in self._relationships(sheet_part).values():
+            if rel_type != DRAWING_REL:
+                continue
+
+            drawing_rels = self._relationships(drawing_part)
+            for anchor in self._read_xml(drawing_part):
+                marker = anchor.find("xdr:from", NS)
+                blip = anchor.find("xdr:pic/xdr:blipFill/a:blip", NS)
+                if marker is None or blip is None or blip.get(R_EMBED) not in drawing_rels:
+                    continue
+
+                column = int(marker.find("xdr:col", NS).text)
+                row = int(marker.find("xdr:row", NS).text)
+                _, media = drawing_rels[blip.get(R_EMBED)]
+                anchors.append((get_column_letter(column + 1), row + 1, ZipImage(self.archive, media)))
+        return anchors
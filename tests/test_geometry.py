@@ -0,0 +1,52 @@
+import math
+import pandas as pd
+import pytest
+from src.geometry import parse_coordinates
+
+@pytest.mark.parametrize("text, expected", [
+    ("-7,18834", -7.18834),
+    ("106.8", 106.8),
+    ("107.5 BT", 107.5),
+    ("7,5°", 7.5),
+    ("7°11'18.03\"LS", -(7 + 11 / 60 + 18.03 / 3600)),
+    ("7° 11' 18\" S", -(7 + 11 / 60 + 18 / 3600)),
+    ("107 29 1.6 BT", 107 + 29 / 60 + 1.6 / 3600),
+    ("S 7 11.3", -(7 + 11.3 / 60)),
+    ("LS 6°54'", -6.9),
+    ("-6°54'", -6.9),
+    ("e 107 29", 107 + 29 / 60),
+])
+def test_parse_coordinates_accepts(text, expected):
+    values, parsed = parse_coordinates(pd.Series([text], dtype=object))
+    assert values[0] == pytest.approx(expected)
+    assert parsed[0] == (not _is_number(text))
+
+@pytest.mark.parametrize("text", [
+    "1.234,5",
+    "-6.912.000",
+    "7.5 30",
+    "7 60",
+    "7 11 60",
+    "7°11'18.03\"LS extra",
+    "abc",
+    "-",
+    "",
+])
+def test_parse_coordinates_rejects(text):
+    values, parsed = parse_coordinates(pd.Series([text], dtype=object))
+    assert math.isnan(values[0])
+    assert not parsed[0]
+
+def test_parse_coordinates_keeps_numbers():
+    values, parsed = parse_coordinates(pd.Series([106.8, None, "-6,9"], dtype=object))
+    assert values[0] == 106.8
+    assert math.isnan(values[1])
+    assert values[2] == -6.9
+    assert parsed.tolist() == [False, False, True]
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,63 @@
+import os
+import pytest
+from src.manifest import ConversionManifest
+
+FORMATS = ["shapefile", "geojson"]
+
+@pytest.fixture
+def converted(tmp_path):
+    """
+    An input workbook and a manifest that recorded its outputs.
+    """
+    source = tmp_path / "survey.xlsx"
+    source.write_bytes(b"workbook v1")
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+    outputs = {}
+    for output_format in FORMATS:
+        path = output_folder / f"survey.{output_format}"
+        path.write_text("output")
+        outputs[output_format] = [str(path)]
+    manifest = ConversionManifest(str(output_folder), "1")
+    manifest.record(str(source), outputs)
+    manifest.save()
+    return source, output_folder
+
+def test_unchanged_input_needs_nothing(converted):
+    source, output_folder = converted
+    assert ConversionManifest(str(output_folder), "1").formats_to_write(str(source), FORMATS) == []
+
+def test_changed_content_rewrites_every_format(converted):
+    source, output_folder = converted
+    source.write_bytes(b"workbook v2")
+    assert ConversionManifest(str(output_folder), "1").formats_to_write(str(source), FORMATS) == FORMATS
+
+def test_touched_input_with_same_content_is_unchanged(converted):
+    source, output_folder = converted
+    stat = os.stat(source)
+    os.utime(source, (stat.st_atime, stat.st_mtime + 60))
+    manifest = ConversionManifest(str(output_folder), "1")
+    assert manifest.formats_to_write(str(source), FORMATS) == []
+    assert manifest.entries[os.path.abspath(source)]["mtime"] == os.stat(source).st_mtime
+
+def test_same_size_edit_is_detected(converted):
+    source, output_folder = converted
+    stat = os.stat(source)
+    source.write_bytes(b"workbook v9")
+    os.utime(source, (stat.st_atime, stat.st_mtime + 60))
+    assert ConversionManifest(str(output_folder), "1").formats_to_write(str(source), FORMATS) == FORMATS
+
+def test_missing_output_is_rewritten(converted):
+    source, output_folder = converted
+    os.remove(output_folder / "survey.geojson")
+    assert ConversionManifest(str(output_folder), "1").formats_to_write(str(source), FORMATS) == ["geojson"]
+
+def test_new_format_is_written(converted):
+    source, output_folder = converted
+    manifest = ConversionManifest(str(output_folder), "1")
+    assert manifest.formats_to_write(str(source), FORMATS + ["gpkg"]) == ["gpkg"]
+
+def test_converter_version_change_rewrites_every_format(converted):
+    source, output_folder = converted
+    manifest = ConversionManifest(str(output_folder), "1+image_mode:jpeg")
+    assert manifest.formats_to_write(str(source), FORMATS) == FORMATS
@@ -0,0 +1,31 @@
+import numpy as np
+import geopandas as gpd
+from shapely.geometry import Point
+from src.partition import PartitionedExport, sanitize_name
+
+def test_sanitize_name():
+    assert sanitize_name("Jl. Asia/Afrika") == "Jl_ Asia_Afrika"
+    assert sanitize_name("  RAMBU 1  ") == "RAMBU 1"
+    assert sanitize_name("") == "unnamed"
+    assert sanitize_name(None) == "unnamed"
+    assert sanitize_name(np.nan) == "unnamed"
+    assert sanitize_name(12) == "12"
+
+def _names(values, keys = ("name",)):
+    gdf = gpd.GeoDataFrame({key: column for key, column in zip(keys, values)},
+                           geometry=[Point(i, i) for i in range(len(values[0]))])
+    return [names for _, names, _ in PartitionedExport("unused", list(keys)).partitions(gdf)]
+
+def test_partition_names_are_unique_ignoring_case():
+    names = [name for name, in _names([["BANDUNG", "Bandung", "Bandung_2", "a/b", "a_b", None]])]
+    assert len({name.lower() for name in names}) == len(names)
+    assert sorted(names) == sorted(["BANDUNG", "Bandung_2", "Bandung_2_2", "a_b", "a_b_2", "unnamed"])
+
+def test_partition_names_only_unique_among_siblings():
+    names = _names([["Bogor", "Bogor", "Garut"], ["Jl. Raya", "jl_ raya", "Jl. Raya"]], keys=("kabupaten", "jalan"))
+    assert sorted(names) == [["Bogor", "Jl_ Raya"], ["Bogor", "jl_ raya_2"], ["Garut", "Jl_ Raya"]]
+
+def test_rows_of_a_value_share_one_name():
+    gdf = gpd.GeoDataFrame({"name": ["x", "y", "x"]}, geometry=[Point(0, 0)] * 3)
+    partitions = PartitionedExport("unused", ["name"]).partitions(gdf)
+    assert [(names, list(positions)) for _, names, positions in partitions] == [(["x"], [0, 2]), (["y"], [1])]
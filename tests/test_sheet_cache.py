@@ -0,0 +1,92 @@
+import os
+import datetime
+import pandas as pd
+import pytest
+from src.schema_registry import SchemaRegistry
+from src.sheet_cache import CachedWorkbook, SheetCache, _decode_value, _encode_value
+
+pytest.importorskip("pyarrow")
+
+HEADER = (("NO", "DETAIL LOKASI", "LATITUDE", "KETERANGAN"),)
+
+@pytest.mark.parametrize("value", [
+    "-", "", "ñ 7°", True, 3, 2 ** 70, 0.1, float("inf"), pd.NaT, pd.Timestamp("2024-05-01 10:30"),
+    datetime.datetime(2024, 5, 1, 10, 30), datetime.date(2024, 5, 1), datetime.time(10, 30, 15),
+    datetime.timedelta(days=2, seconds=5, microseconds=7),
+])
+def test_value_round_trip(value):
+    decoded = _decode_value(_encode_value(value))
+    assert type(decoded) is type(value)
+    assert decoded is pd.NaT if value is pd.NaT else decoded == value
+
+def test_nan_and_none_round_trip():
+    assert _encode_value(None) is None
+    assert pd.isna(_decode_value(_encode_value(float("nan"))))
+
+def test_unknown_types_are_refused():
+    with pytest.raises(TypeError):
+        _encode_value(object())
+
+def _cache(tmp_path, registry):
+    return SheetCache(str(tmp_path / "cache"), "1", registry, max_mb=10)
+
+def _workbook(tmp_path, registry):
+    source = tmp_path / "survey.xlsx"
+    source.write_bytes(b"workbook")
+    layout = registry.compile(HEADER, lambda rows: list(rows[0]))
+    df = pd.DataFrame({
+        "NO": pd.Series([1, 2, 3], dtype="int64"),
+        "DETAIL LOKASI": ["Jl. Asia Afrika", "Jl. Braga", None],
+        "LATITUDE": pd.Series([-6.9, "-", 7], dtype=object),
+        "KETERANGAN": pd.Series([pd.Timestamp("2024-05-01"), "rusak", None], dtype=object),
+    })
+    return str(source), CachedWorkbook({"RAMBU 1": df}, {"RAMBU 1": layout}, [])
+
+def test_sheet_round_trip(tmp_path):
+    registry = SchemaRegistry()
+    source, workbook = _workbook(tmp_path, registry)
+    cache = _cache(tmp_path, registry)
+    key = cache.key(source)
+    assert cache.put(key, workbook)
+
+    cached = cache.get(key)
+    expected = workbook.sheets["RAMBU 1"]
+    pd.testing.assert_frame_equal(cached.sheets["RAMBU 1"], expected)
+    assert [type(value) for value in cached.sheets["RAMBU 1"]["LATITUDE"]] == [float, str, int]
+    assert cached.layouts["RAMBU 1"].to_dict() == workbook.layouts["RAMBU 1"].to_dict()
+
+def test_cache_stores_no_pickle(tmp_path):
+    import pyarrow.parquet as pq
+
+    registry = SchemaRegistry()
+    source, workbook = _workbook(tmp_path, registry)
+    cache = _cache(tmp_path, registry)
+    key = cache.key(source)
+    cache.put(key, workbook)
+    entry_folder = os.path.join(cache.root, key)
+    for name in os.listdir(entry_folder):
+        if name.endswith(".parquet"):
+            schema = pq.read_schema(os.path.join(entry_folder, name))
+            assert all(str(field.type) in ("int64", "string", "large_string") for field in schema)
+
+def test_changed_workbook_misses(tmp_path):
+    registry = SchemaRegistry()
+    source, workbook = _workbook(tmp_path, registry)
+    cache = _cache(tmp_path, registry)
+    cache.put(cache.key(source), workbook)
+    with open(source, "ab") as f:
+        f.write(b" edited")
+    assert cache.get(cache.key(source)) is None
+
+def test_missing_images_invalidate_the_entry(tmp_path):
+    registry = SchemaRegistry()
+    source, workbook = _workbook(tmp_path, registry)
+    image = tmp_path / "img.jpg"
+    image.write_bytes(b"jpeg")
+    workbook.images = [str(image)]
+    cache = _cache(tmp_path, registry)
+    key = cache.key(source)
+    cache.put(key, workbook)
+    assert cache.get(key) is not None
+    os.remove(image)
+    assert cache.get(key) is None
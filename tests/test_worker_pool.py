@@ -0,0 +1,57 @@
+import zipfile
+import pytest
+from src.worker_pool import ConversionPool, output_claims
+
+WORKBOOK_XML = ('<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheets>{}</sheets></workbook>')
+
+def _workbook(folder, name, sheets):
+    path = folder / name
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("xl/workbook.xml", WORKBOOK_XML.format("".join(f'<sheet name="{sheet}"/>' for sheet in sheets)))
+    return str(path)
+
+@pytest.fixture
+def pool():
+    # Never started: only the scheduling is exercised
+    return ConversionPool(2)
+
+def _start_order(pool):
+    started = []
+    while True:
+        task = pool._next_task()
+        if task is None:
+            return started
+        pool._queued.remove(task)
+        pool._running[task.id] = task
+        started.append(task)
+
+def test_claims_are_sheet_and_workbook_names(tmp_path):
+    claims = output_claims(_workbook(tmp_path, "a.xlsx", ["RAMBU 1", "Marka"]), str(tmp_path / "out"))
+    assert {name for _, name in claims} == {"workbook:a", "sheet:rambu 1", "sheet:marka"}
+
+def test_unreadable_workbook_claims_the_folder(tmp_path):
+    path = tmp_path / "bad.xlsx"
+    path.write_bytes(b"not a zip")
+    assert {name for _, name in output_claims(str(path), str(tmp_path))} == {None}
+
+def test_colliding_workbooks_wait_in_order(tmp_path, pool):
+    first = pool.submit(_workbook(tmp_path, "a.xlsx", ["RAMBU 1"]), str(tmp_path / "out"), ["geojson"])
+    second = pool.submit(_workbook(tmp_path, "b.xlsx", ["rambu 1", "MARKA"]), str(tmp_path / "out"), ["geojson"])
+    third = pool.submit(_workbook(tmp_path, "c.xlsx", ["MARKA"]), str(tmp_path / "out"), ["geojson"])
+    other = pool.submit(_workbook(tmp_path, "d.xlsx", ["LAMPU"]), str(tmp_path / "out"), ["geojson"])
+    # b collides with the running a, and c with the waiting b, so only d may run beside a
+    assert _start_order(pool) == [first, other]
+    assert list(pool._queued) == [second, third]
+
+def test_other_output_folders_do_not_collide(tmp_path, pool):
+    path = _workbook(tmp_path, "a.xlsx", ["RAMBU 1"])
+    tasks = [pool.submit(path, str(tmp_path / "job1"), ["geojson"]), pool.submit(path, str(tmp_path / "job2"), ["geojson"])]
+    assert _start_order(pool) == tasks
+
+def test_unreadable_workbook_runs_alone_in_its_folder(tmp_path, pool):
+    bad = tmp_path / "bad.xlsx"
+    bad.write_bytes(b"not a zip")
+    first = pool.submit(str(bad), str(tmp_path / "out"), ["geojson"])
+    pool.submit(_workbook(tmp_path, "a.xlsx", ["RAMBU 1"]), str(tmp_path / "out"), ["geojson"])
+    elsewhere = pool.submit(_workbook(tmp_path, "b.xlsx", ["RAMBU 1"]), str(tmp_path / "other"), ["geojson"])
+    assert _start_order(pool) == [first, elsewhere]
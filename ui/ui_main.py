@@ -80,6 +80,29 @@ class Ui_Main(object):
         self.verticalLayout_2.addLayout(self.gridLayout_2)
         self.tabWidget.addTab(self.bulkTab, "")
         self.verticalLayout_3.addWidget(self.tabWidget)
+        self.formatLayout = QtWidgets.QHBoxLayout()
+        self.formatLayout.setObjectName("formatLayout")
+        self.labelFormats = QtWidgets.QLabel(parent=self.centralwidget)
+        self.labelFormats.setObjectName("labelFormats")
+        self.formatLayout.addWidget(self.labelFormats)
+        self.chkGeoJSON = QtWidgets.QCheckBox(parent=self.centralwidget)
+        self.chkGeoJSON.setChecked(True)
+        self.chkGeoJSON.setObjectName("chkGeoJSON")
+        self.formatLayout.addWidget(self.chkGeoJSON)
+        self.chkShapefile = QtWidgets.QCheckBox(parent=self.centralwidget)
+        self.chkShapefile.setChecked(True)
+        self.chkShapefile.setObjectName("chkShapefile")
+        self.formatLayout.addWidget(self.chkShapefile)
+        self.chkGeoPackage = QtWidgets.QCheckBox(parent=self.centralwidget)
+        self.chkGeoPackage.setObjectName("chkGeoPackage")
+        self.formatLayout.addWidget(self.chkGeoPackage)
+        self.chkFlatGeobuf = QtWidgets.QCheckBox(parent=self.centralwidget)
+        self.chkFlatGeobuf.setObjectName("chkFlatGeobuf")
+        self.formatLayout.addWidget(self.chkFlatGeobuf)
+        self.chkGeoParquet = QtWidgets.QCheckBox(parent=self.centralwidget)
+        self.chkGeoParquet.setObjectName("chkGeoParquet")
+        self.formatLayout.addWidget(self.chkGeoParquet)
+        self.verticalLayout_3.addLayout(self.formatLayout)
         self.horizontalLayout = QtWidgets.QHBoxLayout()
         self.horizontalLayout.setObjectName("horizontalLayout")
         spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Minimum)
@@ -131,5 +154,11 @@ class Ui_Main(object):
         self.label_4.setText(_translate("Main", "Output Directory"))
         self.btnBulkOutDir.setText(_translate("Main", "..."))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.bulkTab), _translate("Main", "Bulk Conversion"))
+        self.labelFormats.setText(_translate("Main", "Output Formats"))
+        self.chkGeoJSON.setText(_translate("Main", "GeoJSON"))
+        self.chkShapefile.setText(_translate("Main", "Shapefile"))
+        self.chkGeoPackage.setText(_translate("Main", "GeoPackage"))
+        self.chkFlatGeobuf.setText(_translate("Main", "FlatGeobuf"))
+        self.chkGeoParquet.setText(_translate("Main", "GeoParquet"))
         self.btnConvert.setText(_translate("Main", "Convert"))
         self.btnCancel.setText(_translate("Main", "Cancel"))